@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Async HTTP Client - FOR EDUCATIONAL PURPOSES ONLY
+
+A deliberately small, non-blocking HTTP/1.1 client built only on asyncio
+streams. It supports keep-alive connection reuse, Content-Length and chunked
+response bodies, and counts every connection it opens so results can be
+compared with the requests-based threaded engine. Bodies are counted as in
+body_reader.py.
+
+It is not a general purpose client: there is no redirect handling, no
+proxies and no compression.
+"""
+
+import asyncio
+import ssl
+from urllib.parse import urlparse
+
+from body_reader import BODY_CHUNK_SIZE, BodyVerifier
+from connection_pool import CONNECTION_MODES
+
+
+class HTTPError(Exception):
+    """Raised when a response cannot be parsed"""
+
+
+class AsyncHTTPClient:
+    """Minimal HTTP/1.1 client with an optional keep-alive connection pool
+
+    verify is the TLS certificate check: True, a CA bundle path or False.
+    """
+
+    def __init__(self, mode="reuse", verify=True, verify_body=False):
+        if mode not in CONNECTION_MODES:
+            raise ValueError(f"Unsupported connection mode: {mode}")
+        self.mode = mode
+        self.verify_body = verify_body
+        self.connections_opened = 0
+        self._idle = {}
+        self._verify = verify
+        self._ssl_context = None
+
+    def _get_ssl_context(self):
+        # Loading the CA store costs ~30 ms of CPU, so plain-HTTP runs skip it
+        if self._ssl_context is None:
+            cafile = self._verify if isinstance(self._verify, str) else None
+            self._ssl_context = ssl.create_default_context(cafile=cafile)
+            if not self._verify:
+                self._ssl_context.check_hostname = False
+                self._ssl_context.verify_mode = ssl.CERT_NONE
+        return self._ssl_context
+
+    async def _open(self, key):
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self._get_ssl_context() if scheme == "https" else None
+        )
+        self.connections_opened += 1
+        return reader, writer
+
+    async def _acquire(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await self._open(key)
+
+    def _release(self, key, reader, writer, keep_alive):
+        if self.mode == "reuse" and keep_alive and not writer.is_closing():
+            self._idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+
+    async def request(self, method, url, headers=None, body=b"", timeout=None):
+        """Send one request and return (status_code, response_headers, body_size)"""
+        return await self.send(self.prepare(method, url, headers, body), timeout)
+
+    def prepare(self, method, url, headers=None, body=b""):
+        """Build the wire form of a request once, for sending many times"""
+        parsed = urlparse(url)
+        scheme = parsed.scheme or "http"
+        port = parsed.port or (443 if scheme == "https" else 80)
+        key = (scheme, parsed.hostname, port)
+        target = parsed.path or "/"
+        if parsed.query:
+            target += "?" + parsed.query
+
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parsed.netloc}"]
+        if self.mode == "new":
+            lines.append("Connection: close")
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        return key, method, payload
+
+    async def send(self, prepared, timeout=None):
+        """Send a request built by prepare() and return (status_code, response_headers, body_size)"""
+        key, method, payload = prepared
+        reader, writer = await self._acquire(key)
+        try:
+            if timeout is None:
+                result = await self._exchange(reader, writer, payload, method)
+            else:
+                result = await asyncio.wait_for(
+                    self._exchange(reader, writer, payload, method), timeout
+                )
+        except BaseException:
+            writer.close()
+            raise
+        status, response_headers, size, keep_alive = result
+        self._release(key, reader, writer, keep_alive)
+        return status, response_headers, size
+
+    async def _exchange(self, reader, writer, payload, method):
+        writer.write(payload)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise HTTPError("Connection closed before response")
+        parts = status_line.decode("latin-1").split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise HTTPError(f"Malformed status line: {status_line!r}")
+        version, status = parts[0], int(parts[1])
+
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        connection = response_headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return status, response_headers, 0, keep_alive
+        verifier = BodyVerifier(lambda name: response_headers.get(name.lower())) if self.verify_body else None
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            size = await self._read_chunked(reader, verifier)
+        elif "content-length" in response_headers:
+            size = await self._read_body(reader, int(response_headers["content-length"]), verifier)
+        else:
+            size = await self._read_body(reader, None, verifier)
+            keep_alive = False
+        if verifier is not None:
+            verifier.finish(size)
+        return status, response_headers, size, keep_alive
+
+    @staticmethod
+    async def _read_body(reader, length, verifier):
+        """Read length bytes (or up to EOF if None) in bounded chunks"""
+        size = 0
+        while length is None or size < length:
+            want = BODY_CHUNK_SIZE if length is None else min(BODY_CHUNK_SIZE, length - size)
+            chunk = await reader.read(want)
+            if not chunk:
+                if length is not None:
+                    raise HTTPError(f"Connection closed after {size} of {length} body bytes")
+                break
+            size += len(chunk)
+            if verifier is not None:
+                verifier.update(chunk)
+        return size
+
+    async def _read_chunked(self, reader, verifier=None):
+        size = 0
+        while True:
+            chunk_line = await reader.readline()
+            if not chunk_line.endswith(b"\n"):
+                raise HTTPError(f"Connection closed after {size} bytes of a chunked body")
+            try:
+                chunk_size = int(chunk_line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HTTPError(f"Malformed chunk size line: {chunk_line[:40]!r}")
+            if chunk_size == 0:
+                # Skip trailers up to the final blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return size
+            size += await self._read_body(reader, chunk_size, verifier)
+            if await reader.readexactly(2) != b"\r\n":
+                raise HTTPError("Chunk data is not followed by CRLF")
+
+    async def close(self):
+        """Close all idle pooled connections"""
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
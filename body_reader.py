@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Body Reader - FOR EDUCATIONAL PURPOSES ONLY
+
+Counts response bodies without keeping them. Reading a whole body into one
+bytes object (response.content, response.read()) allocates and copies as
+much memory as the response is large, only for the load tester to take its
+len(); against large payloads that client CPU shows up as latency. Bodies
+are instead:
+
+- streamed in bounded chunks (requests with stream=True, asyncio reads), or
+- read with readinto into one reusable buffer per thread (raw sockets)
+
+so memory use per request stays at BODY_CHUNK_SIZE however large the body.
+
+Optionally, a BodyVerifier checks every body incrementally, chunk by chunk:
+
+- the byte count must match Content-Length
+- the SHA-256/SHA-512 digest must match a Content-Digest header (RFC 9530),
+  which the bundled local_target_server.py sends
+
+so truncated or corrupted responses under load are caught at no extra
+memory cost. Sizes are bytes as received, before any content decoding.
+"""
+
+import base64
+import hashlib
+import threading
+
+BODY_CHUNK_SIZE = 64 * 1024
+
+DIGEST_ALGORITHMS = {"sha-256": "sha256", "sha-512": "sha512"}
+
+_local = threading.local()
+
+
+class BodyVerificationError(Exception):
+    """Raised when a body does not match its Content-Length or Content-Digest"""
+
+
+def _thread_buffer():
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = memoryview(bytearray(BODY_CHUNK_SIZE))
+    return buffer
+
+
+def parse_content_digest(value):
+    """Return (hashlib name, expected digest bytes) for the first supported algorithm"""
+    for item in value.split(","):
+        algorithm, _, encoded = item.strip().partition("=")
+        name = DIGEST_ALGORITHMS.get(algorithm.strip().lower())
+        if name and encoded.startswith(":") and encoded.endswith(":"):
+            try:
+                return name, base64.b64decode(encoded[1:-1])
+            except ValueError:
+                raise BodyVerificationError(f"Malformed Content-Digest: {value}")
+    return None
+
+
+def content_digest_header(body, algorithm="sha-256"):
+    """Content-Digest header value for body (for servers)"""
+    digest = hashlib.new(DIGEST_ALGORITHMS[algorithm], body).digest()
+    return f"{algorithm}=:{base64.b64encode(digest).decode()}:"
+
+
+class BodyVerifier:
+    """Incremental length and digest check of one response body
+
+    get_header(name) must return the header value or None.
+    """
+
+    def __init__(self, get_header):
+        length = get_header("Content-Length")
+        encoding = (get_header("Content-Encoding") or "identity").lower()
+        self.expected_length = int(length) if length is not None and encoding == "identity" else None
+        digest = get_header("Content-Digest")
+        expected = parse_content_digest(digest) if digest else None
+        self._hash = hashlib.new(expected[0]) if expected else None
+        self._expected_digest = expected[1] if expected else None
+
+    def update(self, chunk):
+        if self._hash is not None:
+            self._hash.update(chunk)
+
+    def finish(self, size):
+        """Raise BodyVerificationError if the finished body does not match"""
+        if self.expected_length is not None and size != self.expected_length:
+            raise BodyVerificationError(f"Body is {size} bytes, Content-Length says {self.expected_length}")
+        if self._hash is not None and self._hash.digest() != self._expected_digest:
+            raise BodyVerificationError("Body does not match its Content-Digest")
+
+
+def drain_chunks(chunks, verifier=None):
+    """Count (and optionally verify) a body given as an iterable of chunks"""
+    size = 0
+    if verifier is None:
+        for chunk in chunks:
+            size += len(chunk)
+        return size
+    for chunk in chunks:
+        size += len(chunk)
+        verifier.update(chunk)
+    verifier.finish(size)
+    return size
+
+
+def drain_response(response, verify=False):
+    """Count the body of a requests response made with stream=True
+
+    The raw stream is read undecoded, so the size and digest are those of
+    the bytes on the wire. The connection goes back to the pool once the
+    body has been read to the end; after a failure it is closed instead.
+    """
+    try:
+        verifier = BodyVerifier(response.headers.get) if verify else None
+        return drain_chunks(response.raw.stream(BODY_CHUNK_SIZE, decode_content=False), verifier)
+    except BaseException:
+        response.close()
+        raise
+
+
+def readinto_body(readinto, verifier=None):
+    """Count a body through readinto(buffer) calls into this thread's buffer"""
+    buffer = _thread_buffer()
+    size = 0
+    while True:
+        count = readinto(buffer)
+        if not count:
+            break
+        size += count
+        if verifier is not None:
+            verifier.update(buffer[:count])
+    if verifier is not None:
+        verifier.finish(size)
+    return size
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Capacity Search - FOR EDUCATIONAL PURPOSES ONLY
+
+Sizes a service by stepping the offered load up in stages instead of
+re-running the load tester by hand with different --threads and --delay:
+
+    python controlled_load_tester.py --url http://localhost:8080 --ramp rate --slo-p99-ms 50
+
+- rate:    the arrival rate grows by a fixed step per stage, at a fixed
+           number of threads
+- threads: the concurrency grows by a fixed step per stage, at a fixed
+           arrival rate
+
+Each stage holds its load for a fixed window and is a complete open-model
+run of its own (fresh schedule and histograms), so the throughput and p99
+reported per stage form the load curve of the service. The search stops
+early at the first stage that breaks the SLO (error rate or p99 latency);
+the last stage that met it is the measured capacity.
+
+The plan never exceeds the tool's caps: no more than max_threads threads, no
+interval shorter than min_delay, and at most max_requests requests over the
+whole search, not per stage.
+"""
+
+from collections import namedtuple
+
+RAMP_MODES = ("rate", "threads")
+
+# Default (start, step) per ramp mode: requests per second or threads
+RAMP_DEFAULTS = {"rate": (2.0, 2.0), "threads": (1, 1)}
+
+DEFAULT_STAGES = 5
+DEFAULT_STAGE_SECONDS = 2.0
+
+Stage = namedtuple("Stage", ["number", "threads", "delay", "requests"])
+
+
+class StageOutcome:
+    """Throughput, errors and latency of one finished stage"""
+
+    def __init__(self, stage, result, breaches):
+        self.stage = stage
+        self.result = result
+        self.breaches = breaches
+        stats = result.stats
+        self.requests = stats.total_requests
+        self.error_rate = stats.error_count / self.requests if self.requests else 0.0
+        # Completions over the stage window, or over the run if it overran
+        # the window because the service (or the client) could not keep up
+        window = stage.requests * stage.delay
+        self.throughput = self.requests / max(result.duration - result.warmup_seconds,
+                                              window - result.warmup_seconds, 1e-9)
+        latency = result.recorder.latency.merged()
+        self.p50_ms = latency.percentile(50) / 1_000_000
+        self.p99_ms = latency.percentile(99) / 1_000_000
+        self.fell_behind = result.schedule.fell_behind
+
+    @property
+    def offered_rps(self):
+        return 1 / self.stage.delay
+
+    @property
+    def met_slo(self):
+        return not self.breaches
+
+
+class SLO:
+    """Service level objective a stage has to meet; None disables a limit"""
+
+    def __init__(self, p99_ms=None, error_rate=None):
+        self.p99_ms = p99_ms
+        self.error_rate = error_rate
+
+    def breaches(self, outcome):
+        """Return descriptions of the limits a stage broke"""
+        breaches = []
+        if self.error_rate is not None and outcome.error_rate > self.error_rate:
+            breaches.append(f"error rate {outcome.error_rate * 100:.1f}% > {self.error_rate * 100:g}%")
+        if self.p99_ms is not None and outcome.p99_ms > self.p99_ms:
+            breaches.append(f"p99 {outcome.p99_ms:.3f} ms > {self.p99_ms:g} ms")
+        return breaches
+
+    def describe(self):
+        limits = []
+        if self.error_rate is not None:
+            limits.append(f"error rate <= {self.error_rate * 100:g}%")
+        if self.p99_ms is not None:
+            limits.append(f"p99 <= {self.p99_ms:g} ms")
+        return ", ".join(limits) or "none (run every stage)"
+
+
+def plan_stages(mode, stages, stage_seconds, threads, delay, max_requests, max_threads, min_delay,
+                start=None, step=None):
+    """Return the Stages of a search, bounded by the caps
+
+    In rate mode start and step are requests per second and threads is
+    fixed; in threads mode they are thread counts and delay is fixed. Once a
+    cap is reached the load stops growing and the plan ends, and the last
+    stage is shortened if the request budget runs out.
+    """
+    if mode not in RAMP_MODES:
+        raise ValueError(f"Unsupported ramp mode: {mode}")
+    default_start, default_step = RAMP_DEFAULTS[mode]
+    start = default_start if start is None else start
+    step = default_step if step is None else step
+    if start <= 0 or step <= 0 or stages < 1 or stage_seconds <= 0:
+        raise ValueError("The ramp start, step, stage count and stage length must be positive")
+
+    plan = []
+    budget = max_requests
+    previous = None
+    for number in range(1, stages + 1):
+        if mode == "rate":
+            rps = min(start + (number - 1) * step, 1 / min_delay)
+            stage_threads, stage_delay = min(threads, max_threads), 1 / rps
+        else:
+            stage_threads, stage_delay = min(int(start + (number - 1) * step), max_threads), max(delay, min_delay)
+        if (stage_threads, stage_delay) == previous:
+            break  # Capped: the next stage would repeat this one
+        previous = (stage_threads, stage_delay)
+        requests = min(max(1, round(stage_seconds / stage_delay)), budget)
+        if requests <= 0:
+            break
+        plan.append(Stage(number, stage_threads, stage_delay, requests))
+        budget -= requests
+    return plan
+
+
+def run_capacity_search(stages, run_stage, slo, report=None):
+    """Run stages in order until one breaks the SLO and return their outcomes
+
+    run_stage(stage) must run one stage and return its LoadTestResult;
+    report(outcome), if given, is called as each stage finishes.
+    """
+    outcomes = []
+    for stage in stages:
+        outcome = StageOutcome(stage, run_stage(stage), [])
+        outcome.breaches = slo.breaches(outcome)
+        outcomes.append(outcome)
+        if report is not None:
+            report(outcome)
+        if outcome.breaches:
+            break
+    return outcomes
+
+
+def format_stage_header():
+    return (f"  {'STAGE':>5} {'THREADS':>7} {'OFFERED':>8} {'ACHIEVED':>8} {'REQS':>5} {'ERR %':>6} "
+            f"{'P50 MS':>9} {'P99 MS':>9}  SLO")
+
+
+def format_stage_line(outcome):
+    stage = outcome.stage
+    verdict = "ok" if outcome.met_slo else "BREACH: " + "; ".join(outcome.breaches)
+    if outcome.fell_behind:
+        verdict += " (client fell behind)"
+    return (f"  {stage.number:>5} {stage.threads:>7} {outcome.offered_rps:>8.2f} {outcome.throughput:>8.2f} "
+            f"{outcome.requests:>5} {outcome.error_rate * 100:>6.1f} {outcome.p50_ms:>9.3f} {outcome.p99_ms:>9.3f}  "
+            f"{verdict}")
+
+
+def format_capacity_summary(outcomes, planned):
+    """Return the closing lines: the capacity found and why the search ended"""
+    passed = [outcome for outcome in outcomes if outcome.met_slo]
+    lines = []
+    if passed:
+        best = passed[-1]
+        lines.append(f"Capacity: {best.throughput:.2f} req/s achieved at {best.offered_rps:.2f} req/s offered "
+                     f"with {best.stage.threads} threads (p99 {best.p99_ms:.3f} ms)")
+    else:
+        lines.append("Capacity: no stage met the SLO")
+    if outcomes and not outcomes[-1].met_slo:
+        lines.append(f"Stopped early at stage {outcomes[-1].stage.number} of {planned} on an SLO breach")
+    elif passed:
+        lines.append("Every planned stage met the SLO; more stages or a larger step (within the caps) may find the limit")
+    if any(outcome.fell_behind for outcome in outcomes):
+        lines.append("WARNING: the client fell behind schedule in some stages; their offered load was lower than shown")
+    return lines
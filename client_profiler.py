@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Client Profiler - FOR EDUCATIONAL PURPOSES ONLY
+
+Shows how much of each reported latency is the load tester itself.
+
+Socket wait: the sockets of pooled connections are switched to subclasses
+that time every blocking call (connect and TLS handshake, send, recv) with
+perf_counter_ns and add it to a per-thread total. Reading that total before
+and after a request splits its service time into:
+
+- socket wait: blocked in the kernel, waiting for the network and the server
+- client code: everything else, i.e. building the request, parsing the
+  response, connection pool and bookkeeping
+
+Together with the queue delay (scheduling) this attributes every reported
+latency to the network, the server or the client.
+
+cProfile: up to Python 3.11 every worker thread runs under its own cProfile
+profiler. From Python 3.12 cProfile is built on sys.monitoring, which is
+interpreter-wide: a single profiler sees every thread, and enabling a second
+one fails, so one profiler covers the whole run (the call stacks of
+concurrent threads interleave in it, so cumulative times are approximate).
+The profiles are merged (across worker processes too) into one pstats dump.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import socket
+import ssl
+import sys
+import threading
+import time
+
+_local = threading.local()
+
+# cProfile uses the interpreter-wide sys.monitoring from Python 3.12
+SHARED_PROFILER = sys.version_info >= (3, 12)
+
+
+def socket_wait_ns():
+    """Total time the current thread has spent blocked in timed sockets"""
+    return getattr(_local, "wait_ns", 0)
+
+
+def add_socket_wait(elapsed_ns):
+    _local.wait_ns = getattr(_local, "wait_ns", 0) + elapsed_ns
+
+
+def _timed(method):
+    def timed_method(self, *args, **kwargs):
+        start_ns = time.perf_counter_ns()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            add_socket_wait(time.perf_counter_ns() - start_ns)
+    timed_method.__name__ = method.__name__
+    return timed_method
+
+
+class TimedSocket(socket.socket):
+    """socket.socket whose blocking calls count as socket wait"""
+
+    __slots__ = ()
+
+    recv = _timed(socket.socket.recv)
+    recv_into = _timed(socket.socket.recv_into)
+    send = _timed(socket.socket.send)
+    sendall = _timed(socket.socket.sendall)
+
+
+class TimedSSLSocket(ssl.SSLSocket):
+    """ssl.SSLSocket whose blocking calls count as socket wait
+
+    recv and recv_into call read, and sendall calls send, so only the outer
+    methods are timed; timing both would count the same wait twice.
+    """
+
+    recv = _timed(ssl.SSLSocket.recv)
+    recv_into = _timed(ssl.SSLSocket.recv_into)
+    sendall = _timed(ssl.SSLSocket.sendall)
+
+
+def time_socket(sock):
+    """Switch an open socket to its timed subclass in place"""
+    if type(sock) is ssl.SSLSocket:
+        sock.__class__ = TimedSSLSocket
+    elif type(sock) is socket.socket:
+        sock.__class__ = TimedSocket
+    return sock
+
+
+def timed_connect(connect):
+    """Wrap an HTTPConnection.connect: the connect (and handshake) is wait, the socket gets timed"""
+    def connect_and_time(self):
+        start_ns = time.perf_counter_ns()
+        try:
+            connect(self)
+        finally:
+            add_socket_wait(time.perf_counter_ns() - start_ns)
+        time_socket(self.sock)
+    return connect_and_time
+
+
+class ThreadProfiles:
+    """cProfile profilers of one run, merged after the run
+
+    Call start() once per run on the dispatching thread and pass initializer
+    to every ThreadPoolExecutor; with a shared profiler (Python 3.12+) the
+    initializer does nothing. The profiles are read with stats() once the
+    executors have shut down. Dumps of worker processes (written to
+    worker_path(k)) are added with add_file().
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._profiles = []
+        self._added = None
+        self._lock = threading.Lock()
+        self._started = False
+
+    def worker_path(self, index):
+        return f"{self.path}.worker{index}"
+
+    def _enable(self):
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        """Profile the calling thread (every thread on Python 3.12+); later calls do nothing"""
+        if not self._started:
+            self._started = True
+            self._enable()
+
+    def initializer(self):
+        if not SHARED_PROFILER:
+            self._enable()
+
+    def add_file(self, path, remove=False):
+        """Merge the stats dumped to path by another process
+
+        The file is read right away, so it can be removed (remove=True) and
+        its path reused, e.g. by the worker processes of the next ramp stage.
+        """
+        if not os.path.exists(path):
+            return
+        stats = pstats.Stats(path)
+        if remove:
+            os.remove(path)
+        with self._lock:
+            if self._added is None:
+                self._added = stats
+            else:
+                self._added.add(stats)
+
+    def stats(self):
+        """Merged pstats.Stats of every thread and added file, or None if empty"""
+        stats = self._added
+        for profile in self._profiles:
+            profile.disable()
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        self._profiles, self._added = [], stats
+        return stats
+
+    def dump(self):
+        """Write the merged stats to path (for pstats or snakeviz) and return them"""
+        stats = self.stats()
+        if stats is not None:
+            stats.dump_stats(self.path)
+        return stats
+
+
+def format_top_functions(stats, limit=15, sort="cumulative"):
+    """Return the print_stats() table of the top functions as lines"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(limit)
+    return [line for line in stream.getvalue().splitlines() if line.strip()]
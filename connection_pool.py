@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Connection Pool Helpers - FOR EDUCATIONAL PURPOSES ONLY
+
+Keep-alive session management shared by the load tester and the protocol
+simulator. In "reuse" mode every worker thread owns one pooled
+requests.Session, so after the first request the TCP (and TLS) connection is
+kept open and only steady-state request latency is measured. In "new" mode a
+fresh session is created and closed for every request, which reproduces the
+cost of a full connection setup each time.
+
+Every connection actually opened is counted, so a run can report how many
+connections it needed compared with how many requests it sent. With profile,
+the connections' sockets also time their blocking calls (see
+client_profiler.py).
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from client_profiler import timed_connect
+
+CONNECTION_MODES = ["reuse", "new"]
+
+
+class ConnectionCounter:
+    """Thread-safe count of connections opened"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def increment(self):
+        with self._lock:
+            self.opened += 1
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report every new connection"""
+
+    def __init__(self, counter, profile=False, **kwargs):
+        # init_poolmanager() runs inside HTTPAdapter.__init__, so the counter
+        # has to be in place first
+        self.counter = counter
+        self.profile = profile
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        counter = self.counter
+
+        # urllib3 reconnects dropped connections without creating a new
+        # connection object, so count at the socket level instead
+        class CountingHTTPConnection(HTTPConnectionPool.ConnectionCls):
+            def _new_conn(self):
+                sock = super()._new_conn()
+                counter.increment()
+                return sock
+
+        class CountingHTTPSConnection(HTTPSConnectionPool.ConnectionCls):
+            def _new_conn(self):
+                sock = super()._new_conn()
+                counter.increment()
+                return sock
+
+        if self.profile:
+            CountingHTTPConnection.connect = timed_connect(HTTPConnectionPool.ConnectionCls.connect)
+            CountingHTTPSConnection.connect = timed_connect(HTTPSConnectionPool.ConnectionCls.connect)
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = CountingHTTPConnection
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = CountingHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+class SessionProvider:
+    """Hands out requests.Session objects according to the connection mode"""
+
+    def __init__(self, mode="reuse", pool_size=1, profile=False, verify=True):
+        if mode not in CONNECTION_MODES:
+            raise ValueError(f"Unsupported connection mode: {mode}")
+        self.mode = mode
+        self.pool_size = max(pool_size, 1)
+        self.profile = profile
+        self.verify = verify
+        self.counter = ConnectionCounter()
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    @property
+    def connections_opened(self):
+        return self.counter.opened
+
+    def _new_session(self):
+        session = requests.Session()
+        session.verify = self.verify
+        adapter = CountingHTTPAdapter(
+            self.counter, self.profile, pool_connections=1, pool_maxsize=self.pool_size
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def acquire(self):
+        """Return the session to use for the next request"""
+        if self.mode == "new":
+            return self._new_session()
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._new_session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def release(self, session):
+        """Finish with a session (closes it in "new" mode)"""
+        if self.mode == "new":
+            session.close()
+
+    def close(self):
+        """Close every pooled session"""
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
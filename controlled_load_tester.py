@@ -9,25 +9,612 @@ WARNING: Only use against servers you own or have explicit permission to test.
 """
 
 import requests
+import urllib3
 import concurrent.futures
 import time
 import argparse
+import asyncio
+import multiprocessing
+import queue
+import random
 import sys
 from urllib.parse import urlparse
 
+from async_http_client import AsyncHTTPClient, HTTPError
+from client_profiler import ThreadProfiles, format_top_functions, socket_wait_ns
+from capacity_search import (DEFAULT_STAGE_SECONDS, DEFAULT_STAGES, RAMP_MODES, SLO, format_capacity_summary,
+                             format_stage_header, format_stage_line, plan_stages, run_capacity_search)
+from body_reader import BodyVerificationError, drain_response
+from connection_pool import CONNECTION_MODES, SessionProvider
+from latency_histogram import LatencyHistogram
+from metrics import DEFAULT_EXPORT_INTERVAL, LoadTestMetrics, MetricsExporter
+from request_scheduler import FixedRateSchedule, LatencyRecorder, ReplaySchedule
+from progress_reporter import ProgressReporter, open_request_log
+from result_sink import ResultSink
+from workload import Endpoint, Workload, load_workload
+
 # Safety limits
 MAX_REQUESTS = 100  # Maximum number of requests allowed
 MAX_THREADS = 10    # Maximum number of concurrent threads
 MIN_DELAY = 0.1     # Minimum delay between thread creation (seconds)
 WHITELIST = ["127.0.0.1", "localhost"]  # Only allow local testing by default
 
-def send_request(url, timeout=2, headers=None):
-    """Send a single HTTP request and return the status code"""
+# Submitted-but-unprocessed requests allowed per worker thread
+IN_FLIGHT_PER_THREAD = 4
+
+def send_request(url, timeout=2, headers=None, recorder=None, sessions=None, intended_ns=None, sink=None,
+                 endpoint=None, warmup=False, metrics=None, verify_body=False):
+    """Send a single HTTP request and return the status code
+
+    Latency is recorded from intended_ns, so queueing before the start is not omitted.
+    """
+    profiling = sessions is not None and sessions.profile
+    wait_start_ns = socket_wait_ns() if profiling else 0
+    start_ns = time.perf_counter_ns()
+    if intended_ns is None:
+        intended_ns = start_ns
+    size = 0
+    error = None
     try:
-        response = requests.get(url, timeout=timeout, headers=headers)
-        return response.status_code
-    except requests.exceptions.RequestException as e:
-        return str(e)
+        if sessions is None:
+            if endpoint is not None:
+                with requests.Session() as session:
+                    response = session.send(endpoint.prepared, timeout=timeout, stream=True)
+                    size = drain_response(response, verify_body)
+            else:
+                with requests.get(url, timeout=timeout, headers=headers, stream=True) as response:
+                    size = drain_response(response, verify_body)
+        else:
+            session = sessions.acquire()
+            try:
+                if endpoint is not None:
+                    response = session.send(endpoint.prepared, timeout=timeout, stream=True)
+                else:
+                    response = session.get(url, timeout=timeout, headers=headers, stream=True)
+                # Reading the body to the end returns the connection to the pool
+                size = drain_response(response, verify_body)
+            finally:
+                sessions.release(session)
+        status = response.status_code
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, BodyVerificationError) as e:
+        status = str(e)
+        error = type(e).__name__
+    end_ns = time.perf_counter_ns()
+    wait_ns = socket_wait_ns() - wait_start_ns if profiling else None
+    key = endpoint.name if endpoint is not None and recorder is not None and recorder.latency_by_key else None
+    if recorder is not None:
+        recorder.record(intended_ns, start_ns, end_ns, key, warmup, wait_ns)
+    if sink is not None:
+        sink.write(intended_ns, start_ns, end_ns, None if error else status, size, error, key, wait_ns, warmup)
+    if metrics is not None:
+        metrics.record(end_ns - intended_ns, status, size, error)
+    return status
+
+class LoadTestStats:
+    """Counts response statuses as requests complete
+    
+    Each result is printed if verbose is set and written to log (a buffered
+    file) if one is given; quiet runs do neither.
+    """
+    
+    def __init__(self, total_requests, verbose=True, log=None):
+        self.total_requests = total_requests
+        self.verbose = verbose
+        self.log = log
+        self.completed = 0
+        self.success_count = 0
+        self.error_count = 0
+        self.status_codes = {}
+        self.endpoint_counts = {}  # endpoint name -> [requests, errors]
+        self.warmup_requests = 0   # completed during warmup, not counted above
+    
+    def record(self, status, endpoint=None):
+        self.completed += 1
+        if self.verbose or self.log is not None:
+            if endpoint is None:
+                line = f"[{self.completed}/{self.total_requests}] Response: {status}"
+            else:
+                line = f"[{self.completed}/{self.total_requests}] {endpoint}: {status}"
+            if self.verbose:
+                print(line)
+            if self.log is not None:
+                self.log.write(line + "\n")
+        
+        # Count successes and errors
+        ok = isinstance(status, int) and 200 <= status < 400
+        if ok:
+            self.success_count += 1
+        else:
+            self.error_count += 1
+        if endpoint is not None:
+            counts = self.endpoint_counts.setdefault(endpoint, [0, 0])
+            counts[0] += 1
+            counts[1] += not ok
+        
+        # Track status code distribution
+        status_str = str(status)
+        self.status_codes[status_str] = self.status_codes.get(status_str, 0) + 1
+
+def run_threaded(workload, total_requests, threads, timeout, connection, schedule, recorder, stats, sink=None,
+                 breakdown=False, warmup_ns=0, metrics=None, verify_body=False, profile=False, profiles=None,
+                 verify=True):
+    """Run the test on a ThreadPoolExecutor and return the connections opened
+    
+    At most IN_FLIGHT_PER_THREAD * threads requests are submitted but not yet
+    processed at any time, so no list of futures grows with the run. With
+    breakdown, results are also counted per workload endpoint. Requests
+    scheduled in the first warmup_ns of the run are sent but not counted.
+    With profile, socket wait is split out of every request's service time,
+    and with profiles (a ThreadProfiles), every worker thread runs under cProfile.
+    """
+    sessions = SessionProvider(connection, pool_size=threads, profile=profile, verify=verify)
+    window = threads * IN_FLIGHT_PER_THREAD
+    completed = queue.SimpleQueue()
+    in_flight = 0
+    initializer = profiles.initializer if profiles is not None else None
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads, initializer=initializer) as executor:
+        # Submit each request at its intended start time; if all workers are
+        # busy it waits in the executor queue and that wait counts as latency
+        schedule.start()
+        if sink is not None:
+            sink.origin_ns = schedule.start_ns
+        def process(item):
+            future, name, warmup = item
+            if warmup:
+                future.result()
+                stats.warmup_requests += 1
+            else:
+                stats.record(future.result(), name)
+        
+        for i in range(total_requests):
+            # Process results as they complete, blocking only when the window is full
+            while in_flight >= window:
+                process(completed.get())
+                in_flight -= 1
+            endpoint = workload.pick(i)
+            name = endpoint.name if breakdown else None
+            warmup = schedule.offset(i) < warmup_ns
+            intended_ns = schedule.wait(i)
+            if metrics is not None:
+                metrics.dispatched()
+            future = executor.submit(send_request, endpoint.url, timeout, None, recorder, sessions, intended_ns, sink,
+                                     endpoint, warmup, metrics, verify_body)
+            future.add_done_callback(lambda f, name=name, warmup=warmup: completed.put((f, name, warmup)))
+            in_flight += 1
+            while not completed.empty():
+                process(completed.get())
+                in_flight -= 1
+        
+        while in_flight:
+            process(completed.get())
+            in_flight -= 1
+    
+    sessions.close()
+    return sessions.connections_opened
+
+async def run_asyncio(workload, total_requests, threads, timeout, connection, schedule, recorder, stats, sink=None,
+                      breakdown=False, warmup_ns=0, metrics=None, verify_body=False, verify=True):
+    """Run the test on one event loop and return the connections opened
+    
+    A semaphore bounds the number of in-flight requests to the thread cap, so
+    the concurrency limit is the same as for the threaded engine. A second,
+    larger semaphore bounds how many tasks exist at once.
+    """
+    client = AsyncHTTPClient(connection, verify=verify, verify_body=verify_body)
+    semaphore = asyncio.Semaphore(threads)
+    window = asyncio.Semaphore(threads * IN_FLIGHT_PER_THREAD)
+    # Requests are built once per endpoint; the loop only picks and sends
+    prepared = {
+        endpoint: client.prepare(endpoint.method, endpoint.url, endpoint.headers, endpoint.body)
+        for endpoint in workload.endpoints
+    }
+    
+    async def send_async_request(intended_ns, endpoint, warmup):
+        name = endpoint.name
+        async with semaphore:
+            start_ns = time.perf_counter_ns()
+            size = 0
+            error = None
+            try:
+                status, _, size = await client.send(prepared[endpoint], timeout=timeout)
+            except asyncio.TimeoutError as e:
+                status = f"Request timed out after {timeout} seconds"
+                error = type(e).__name__
+            except (OSError, HTTPError, asyncio.IncompleteReadError, ValueError, BodyVerificationError) as e:
+                status = str(e)
+                error = type(e).__name__
+            end_ns = time.perf_counter_ns()
+            key = name if breakdown else None
+            recorder.record(intended_ns, start_ns, end_ns, key, warmup)
+            if sink is not None:
+                sink.write(intended_ns, start_ns, end_ns, None if error else status, size, error, key,
+                           warmup=warmup)
+            if metrics is not None:
+                metrics.record(end_ns - intended_ns, status, size, error)
+        if warmup:
+            stats.warmup_requests += 1
+        else:
+            stats.record(status, name if breakdown else None)
+        window.release()
+    
+    # Create each task at its intended start time; waiting on the semaphore
+    # counts as queue delay
+    tasks = set()
+    schedule.start()
+    if sink is not None:
+        sink.origin_ns = schedule.start_ns
+    for i in range(total_requests):
+        await window.acquire()
+        endpoint = workload.pick(i)
+        warmup = schedule.offset(i) < warmup_ns
+        intended_ns = await schedule.wait_async(i)
+        if metrics is not None:
+            metrics.dispatched()
+        task = asyncio.ensure_future(send_async_request(intended_ns, endpoint, warmup))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    
+    await client.close()
+    return client.connections_opened
+
+class LoadTestResult:
+    """Everything measured during one load test run"""
+    
+    def __init__(self, engine, connection, stats, recorder, schedule, duration, cpu_time, connections_opened,
+                 processes=1, warmup_seconds=0.0):
+        self.engine = engine
+        self.processes = processes
+        # Intended start of the first counted request; earlier ones were warmup
+        self.warmup_seconds = warmup_seconds
+        self.connection = connection
+        self.stats = stats
+        self.recorder = recorder
+        self.schedule = schedule
+        self.duration = duration
+        self.cpu_time = cpu_time
+        self.connections_opened = connections_opened
+
+def build_schedule(workload, total_requests, delay):
+    """Return the schedule of a run and its request count (a replay may be shorter)"""
+    if workload is not None and workload.is_replay:
+        offsets = workload.replay_offsets()
+        total_requests = min(total_requests, len(offsets))
+        return ReplaySchedule(offsets[:total_requests], min_interval=MIN_DELAY), total_requests
+    return FixedRateSchedule(delay), total_requests
+
+def count_warmup_requests(schedule, total_requests, warmup):
+    """Number of requests scheduled within the first warmup seconds"""
+    warmup_ns = int(warmup * 1_000_000_000)
+    return sum(1 for i in range(total_requests) if schedule.offset(i) < warmup_ns)
+
+def run_load_test(url, total_requests, threads, delay, timeout=2.0, engine="threads", connection="reuse",
+                  headers=None, sink=None, verbose=True, bypass_whitelist=False, workload=None, progress=False,
+                  log=None, processes=1, metrics=None, warmup=0.0, verify_body=False, profile=False,
+                  profiles=None, verify=True):
+    """Run one load test without any prompts and return a LoadTestResult
+    
+    The safety limits and the whitelist are enforced here as well as in
+    main(), so programmatic callers such as the self-benchmark get the same
+    rails as the command line. Without a workload every request is a GET to
+    url; with one, results are also broken down per endpoint, and a replay
+    workload supplies its own arrival times (never closer than MIN_DELAY).
+    With progress, a rolling status line replaces the per-request output.
+    
+    With processes > 1 the requests and threads are split across worker
+    processes (see run_processes); the caps apply to the total.
+    
+    Requests scheduled during the first warmup seconds are sent but left out
+    of the returned statistics. If a LoadTestMetrics is given, every request
+    (warmup included) is also counted in it as it completes. With
+    verify_body, every response body is checked against its Content-Length
+    and Content-Digest.
+    
+    With profile (threads engine only), the service time of every request is
+    split into socket wait and client code. With profiles, a ThreadProfiles,
+    the dispatching thread and every worker run under cProfile; its stats()
+    are complete once this returns.
+    
+    verify is the TLS certificate check, as in requests: True, the path of
+    a CA bundle to trust (e.g. the local target server's certificate), or
+    False, which is only allowed for whitelisted targets.
+    """
+    if profile and engine != "threads":
+        raise ValueError("The socket wait split needs the threads engine")
+    if verify is False and bypass_whitelist:
+        raise ValueError("Certificate checks can only be skipped for whitelisted targets")
+    breakdown = workload is not None
+    if workload is None:
+        workload = Workload([Endpoint(f"GET {url}", "GET", url, headers)])
+    for endpoint in workload.endpoints:
+        if not bypass_whitelist and not is_safe_target(endpoint.url):
+            raise ValueError(f"Target {endpoint.url} is not in the whitelist: {', '.join(WHITELIST)}")
+    total_requests = min(total_requests, MAX_REQUESTS)
+    threads = min(threads, MAX_THREADS)
+    delay = max(delay, MIN_DELAY)
+    
+    schedule, total_requests = build_schedule(workload, total_requests, delay)
+    warmup_ns = int(warmup * 1_000_000_000)
+    warmup_requests = count_warmup_requests(schedule, total_requests, warmup)
+    if warmup_requests == total_requests:
+        raise ValueError("The warmup period covers every request of the run")
+    warmup_seconds = schedule.offset(warmup_requests) / 1_000_000_000 if warmup_requests else 0.0
+    
+    # Every worker process needs at least one request and one thread
+    processes = max(1, min(processes, threads, total_requests))
+    if processes > 1:
+        if progress or log is not None or metrics is not None:
+            raise ValueError("Progress output, the per-request log and live metrics need a single process")
+        return run_processes(workload, total_requests, threads, timeout, engine, connection, schedule, sink,
+                             breakdown, processes, warmup_ns, warmup_seconds, verify_body, profile, profiles, verify)
+    
+    stats = LoadTestStats(total_requests - warmup_requests, verbose=verbose and not progress, log=log)
+    reporter = None
+    if progress:
+        # Dispatches are counted by the schedule, completions by the window
+        reporter = ProgressReporter(total_requests, lambda: (schedule.dispatch_lag.total_count, stats.error_count))
+    recorder = LatencyRecorder(workload.names if breakdown else (), window=reporter.window if reporter else None,
+                               profile=profile)
+    if reporter is not None:
+        reporter.start()
+    
+    start = time.time()
+    cpu_start = time.process_time()
+    if profiles is not None:
+        profiles.start()  # The dispatching thread (or the event loop), once over all ramp stages
+    if engine == "asyncio":
+        connections_opened = asyncio.run(run_asyncio(
+            workload, total_requests, threads, timeout, connection, schedule, recorder, stats, sink, breakdown,
+            warmup_ns, metrics, verify_body, verify))
+    else:
+        connections_opened = run_threaded(
+            workload, total_requests, threads, timeout, connection, schedule, recorder, stats, sink, breakdown,
+            warmup_ns, metrics, verify_body, profile, profiles, verify)
+    cpu_time = time.process_time() - cpu_start
+    duration = time.time() - start
+    if reporter is not None:
+        reporter.stop()
+    return LoadTestResult(engine, connection, stats, recorder, schedule, duration, cpu_time, connections_opened,
+                          warmup_seconds=warmup_seconds)
+
+def process_worker(workload, offsets_ns, threads, timeout, engine, connection, breakdown, results_path, start_event,
+                   conn, warmup_ns=0, verify_body=False, profile=False, profile_path=None, verify=True):
+    """Worker process: run a share of the requests and send back compact results
+    
+    offsets_ns are this worker's intended start times in nanoseconds on the
+    shared schedule. Only merged histograms and counters go back over the pipe, never
+    per-request data; per-request records go to the worker's own results file,
+    and cProfile stats, if requested, to the worker's own profile_path.
+    """
+    random.seed()  # Forked workers would otherwise make identical weighted picks
+    total_requests = len(offsets_ns)
+    schedule = ReplaySchedule.from_offsets_ns(offsets_ns)
+    warmup_requests = sum(1 for offset_ns in offsets_ns if offset_ns < warmup_ns)
+    stats = LoadTestStats(total_requests - warmup_requests, verbose=False)
+    recorder = LatencyRecorder(workload.names if breakdown else (), profile=profile)
+    sink = ResultSink(results_path) if results_path else None
+    profiles = ThreadProfiles(profile_path) if profile_path else None
+    conn.send("ready")
+    start_event.wait()
+    
+    cpu_start = time.process_time()
+    if profiles is not None:
+        profiles.start()
+    if engine == "asyncio":
+        connections_opened = asyncio.run(run_asyncio(
+            workload, total_requests, threads, timeout, connection, schedule, recorder, stats, sink, breakdown,
+            warmup_ns, verify_body=verify_body, verify=verify))
+    else:
+        connections_opened = run_threaded(
+            workload, total_requests, threads, timeout, connection, schedule, recorder, stats, sink, breakdown,
+            warmup_ns, verify_body=verify_body, profile=profile, profiles=profiles, verify=verify)
+    cpu_time = time.process_time() - cpu_start
+    if sink is not None:
+        sink.close()
+    if profiles is not None:
+        profiles.dump()
+    
+    conn.send({
+        "latency": recorder.latency.merged(),
+        "queue_delay": recorder.queue_delay.merged(),
+        "service_time": recorder.service_time.merged(),
+        "latency_by_key": {key: histograms.merged() for key, histograms in recorder.latency_by_key.items()},
+        "socket_wait": recorder.socket_wait.merged() if profile else None,
+        "client_time": recorder.client_time.merged() if profile else None,
+        "status_codes": stats.status_codes,
+        "success_count": stats.success_count,
+        "error_count": stats.error_count,
+        "endpoint_counts": stats.endpoint_counts,
+        "warmup_requests": stats.warmup_requests,
+        "dispatch_lag": schedule.dispatch_lag,
+        "late_dispatches": schedule.late_dispatches,
+        "cpu_time": cpu_time,
+        "connections_opened": connections_opened,
+    })
+    conn.close()
+
+def run_processes(workload, total_requests, threads, timeout, engine, connection, schedule, sink, breakdown,
+                  processes, warmup_ns=0, warmup_seconds=0.0, verify_body=False, profile=False, profiles=None,
+                  verify=True):
+    """Run the test on several worker processes and merge their results
+    
+    Worker k takes requests k, k + processes, k + 2 * processes, ... of the
+    global schedule, so the offered load is the same as in a single process,
+    and gets its share of the thread budget. Each process has its own GIL,
+    so TLS and response parsing in one worker no longer delay the timing
+    code of another. Workers start together on a shared event.
+    """
+    offsets_ns = [schedule.offset(i) for i in range(total_requests)]
+    start_event = multiprocessing.Event()
+    workers = []
+    for k in range(processes):
+        share = Workload(workload.endpoints, trace=workload.trace[k::processes]) if workload.is_replay else workload
+        worker_threads = threads // processes + (k < threads % processes)
+        results_path = f"{sink.path}.worker{k}" if sink is not None else None
+        profile_path = profiles.worker_path(k) if profiles is not None else None
+        conn, child_conn = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=process_worker,
+            args=(share, offsets_ns[k::processes], worker_threads, timeout, engine, connection, breakdown,
+                  results_path, start_event, child_conn, warmup_ns, verify_body, profile, profile_path, verify),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        workers.append((process, conn, results_path))
+    for _, conn, _ in workers:
+        conn.recv()
+    
+    start = time.time()
+    start_event.set()
+    results = [conn.recv() for _, conn, _ in workers]
+    duration = time.time() - start
+    for process, _, _ in workers:
+        process.join()
+    
+    # Merge: histograms are added to the recorder, counters summed
+    stats = LoadTestStats(0, verbose=False)
+    recorder = LatencyRecorder(workload.names if breakdown else (), profile=profile)
+    merged_schedule = FixedRateSchedule(schedule.interval_ns / 1_000_000_000)
+    merged_schedule.dispatch_lag = LatencyHistogram()
+    cpu_time = 0.0
+    connections_opened = 0
+    for result in results:
+        recorder.latency.add(result["latency"])
+        recorder.queue_delay.add(result["queue_delay"])
+        recorder.service_time.add(result["service_time"])
+        for key, histogram in result["latency_by_key"].items():
+            recorder.latency_by_key[key].add(histogram)
+        if profile:
+            recorder.socket_wait.add(result["socket_wait"])
+            recorder.client_time.add(result["client_time"])
+        for status, count in result["status_codes"].items():
+            stats.status_codes[status] = stats.status_codes.get(status, 0) + count
+        stats.success_count += result["success_count"]
+        stats.error_count += result["error_count"]
+        stats.completed += result["success_count"] + result["error_count"]
+        stats.total_requests += result["success_count"] + result["error_count"]
+        stats.warmup_requests += result["warmup_requests"]
+        for name, (count, errors) in result["endpoint_counts"].items():
+            counts = stats.endpoint_counts.setdefault(name, [0, 0])
+            counts[0] += count
+            counts[1] += errors
+        merged_schedule.dispatch_lag.merge(result["dispatch_lag"])
+        merged_schedule.late_dispatches += result["late_dispatches"]
+        cpu_time += result["cpu_time"]
+        connections_opened += result["connections_opened"]
+    
+    for _, _, results_path in workers:
+        if results_path is not None:
+            sink.append_file(results_path, remove=True)
+    if profiles is not None:
+        for k in range(processes):
+            profiles.add_file(profiles.worker_path(k), remove=True)
+    
+    return LoadTestResult(engine, connection, stats, recorder, merged_schedule, duration, cpu_time,
+                          connections_opened, processes=processes, warmup_seconds=warmup_seconds)
+
+def print_test_summary(result):
+    """Print the summary of a finished run"""
+    stats = result.stats
+    total_requests = stats.total_requests
+    
+    print("\n" + "="*50)
+    print("TEST SUMMARY")
+    print("="*50)
+    print(f"Total requests: {total_requests}")
+    print(f"Successful responses: {stats.success_count}")
+    print(f"Error responses: {stats.error_count}")
+    print(f"Success rate: {(stats.success_count/total_requests)*100:.2f}%")
+    print(f"Total duration: {result.duration:.2f} seconds")
+    if stats.warmup_requests:
+        print(f"Warmup: {stats.warmup_requests} requests in the first {result.warmup_seconds:g} seconds sent but excluded")
+    print(f"Requests per second: {total_requests/max(result.duration - result.warmup_seconds, 1e-9):.2f}")
+    print(f"Connections opened: {result.connections_opened} for {total_requests} requests ({result.connection} mode)")
+    print(f"Client CPU time: {result.cpu_time:.3f} seconds ({result.cpu_time/(total_requests + stats.warmup_requests)*1000:.3f} ms per request, {result.engine} engine)")
+    if result.processes > 1:
+        print(f"Worker processes: {result.processes} (CPU time summed over workers)")
+    
+    print("\nResponse code distribution:")
+    for status, count in stats.status_codes.items():
+        print(f"  {status}: {count} ({count/total_requests*100:.2f}%)")
+    
+    # Worker histograms are merged only once, after the run has finished
+    print("\nLatency distribution (from intended start time):")
+    for line in result.recorder.latency.merged().format_summary():
+        print(line)
+    print("\nQueue delay (intended start -> actual start):")
+    for line in result.recorder.queue_delay.merged().format_summary():
+        print(line)
+    print("\nService time (actual start -> response):")
+    for line in result.recorder.service_time.merged().format_summary():
+        print(line)
+    if result.recorder.socket_wait is not None:
+        print_time_split(result.recorder)
+    print("\nSchedule adherence:")
+    for line in result.schedule.format_summary():
+        print(line)
+    
+    if stats.endpoint_counts:
+        print("\nPer-endpoint breakdown (latency from intended start time):")
+        print(f"  {'ENDPOINT':<30} {'REQUESTS':>9} {'ERRORS':>7} {'P50 MS':>9} {'P99 MS':>9} {'MAX MS':>9}")
+        for name, histograms in result.recorder.latency_by_key.items():
+            requests_sent, errors = stats.endpoint_counts.get(name, (0, 0))
+            if not requests_sent:
+                continue
+            histogram = histograms.merged()
+            print(f"  {name[:30]:<30} {requests_sent:>9} {errors:>7} {histogram.percentile(50) / 1e6:>9.3f} "
+                  f"{histogram.percentile(99) / 1e6:>9.3f} {histogram.max_recorded / 1e6:>9.3f}")
+
+def run_ramp(args, stages, headers, workload, processes, metrics, profiles=None, verify=True):
+    """Run a capacity search from the command line and print its load curve"""
+    def run_stage(stage):
+        return run_load_test(args.url, stage.requests, stage.threads, stage.delay, args.timeout, engine=args.engine,
+                             connection=args.connection, headers=headers, verbose=False,
+                             bypass_whitelist=args.bypass_whitelist, workload=workload, processes=processes,
+                             metrics=metrics, warmup=args.warmup, verify_body=args.verify_body, profiles=profiles,
+                             verify=verify)
+    
+    def report(outcome):
+        print(format_stage_line(outcome), flush=True)
+    
+    print("\nLoad curve (latency from intended start time):")
+    print(format_stage_header())
+    outcomes = run_capacity_search(stages, run_stage, SLO(args.slo_p99_ms, args.slo_error_rate), report)
+    
+    print("\n" + "="*50)
+    print("CAPACITY SEARCH SUMMARY")
+    print("="*50)
+    for line in format_capacity_summary(outcomes, len(stages)):
+        print(line)
+    print(f"Requests sent: {sum(outcome.requests + outcome.result.stats.warmup_requests for outcome in outcomes)} "
+          f"(cap: {MAX_REQUESTS} over the whole search)")
+
+def print_time_split(recorder):
+    """Print how the service time divides into socket wait and client code"""
+    service = recorder.service_time.merged()
+    socket_wait = recorder.socket_wait.merged()
+    client_time = recorder.client_time.merged()
+    print("\nService time split (--profile):")
+    print(f"  {'PART':<12} {'MEAN MS':>9} {'P50 MS':>9} {'P99 MS':>9} {'MAX MS':>9} {'SHARE':>7}")
+    for name, histogram in (("socket wait", socket_wait), ("client code", client_time)):
+        share = histogram.mean() / service.mean() * 100 if service.mean() else 0.0
+        print(f"  {name:<12} {histogram.mean() / 1e6:>9.3f} {histogram.percentile(50) / 1e6:>9.3f} "
+              f"{histogram.percentile(99) / 1e6:>9.3f} {histogram.max_recorded / 1e6:>9.3f} {share:>6.1f}%")
+    print("  Socket wait is connect, TLS handshake, send and receive; client code is the rest of the")
+    print("  service time (building requests, parsing responses, pool and bookkeeping).")
+
+def print_cprofile(profiles, limit=15):
+    """Dump the merged cProfile stats and print the top functions"""
+    stats = profiles.dump()
+    if stats is None:
+        return
+    print(f"\ncProfile stats written to {profiles.path} (view with: python -m pstats {profiles.path})")
+    print(f"Top {limit} functions by cumulative time:")
+    for line in format_top_functions(stats, limit):
+        print(f"  {line}")
 
 def is_safe_target(url):
     """Check if the target URL is in the whitelist"""
@@ -45,7 +632,55 @@ def main():
     parser.add_argument("--requests", type=int, default=50, help=f"Number of requests (default: 50, max: {MAX_REQUESTS})")
     parser.add_argument("--threads", type=int, default=5, help=f"Number of concurrent threads (default: 5, max: {MAX_THREADS})")
     parser.add_argument("--timeout", type=float, default=2.0, help="Request timeout in seconds (default: 2.0)")
-    parser.add_argument("--delay", type=float, default=0.2, help=f"Delay between thread creation in seconds (default: 0.2, min: {MIN_DELAY})")
+    parser.add_argument("--delay", type=float, default=0.2, help=f"Interval between scheduled request start times in seconds (default: 0.2, min: {MIN_DELAY})")
+    parser.add_argument("--connection", default="reuse", choices=CONNECTION_MODES,
+                        help="Reuse one keep-alive session per thread or open a new connection per request (default: reuse)")
+    parser.add_argument("--engine", default="threads", choices=["threads", "asyncio"],
+                        help="Run requests on a thread pool or on a single asyncio event loop (default: threads)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Split the requests and threads across N worker processes (default: 1)")
+    parser.add_argument("--results-out", metavar="FILE",
+                        help="Stream one JSON record per request to FILE (JSONL)")
+    parser.add_argument("--scenario", metavar="FILE",
+                        help="JSONL workload of weighted endpoints or a trace to replay; paths are relative to --url")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Do not print a line per request; only the summary is shown")
+    parser.add_argument("--progress", action="store_true",
+                        help="Like --quiet, plus a live line with rolling RPS, in-flight count, errors and p99")
+    parser.add_argument("--log", metavar="FILE",
+                        help="Write the per-request lines to FILE through a buffer instead of the console")
+    parser.add_argument("--warmup", type=float, default=0.0,
+                        help="Send but exclude from the final stats the requests of the first SECONDS (default: 0)")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="Export live metrics in Prometheus text format to FILE every interval")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve live metrics in Prometheus text format on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_EXPORT_INTERVAL,
+                        help=f"Seconds between metrics snapshots (default: {DEFAULT_EXPORT_INTERVAL})")
+    parser.add_argument("--verify-body", action="store_true",
+                        help="Check every response body against its Content-Length and Content-Digest while streaming it")
+    parser.add_argument("--cafile", metavar="FILE",
+                        help="Trust the certificate(s) in FILE for https targets, e.g. the local target server's")
+    parser.add_argument("--insecure", action="store_true",
+                        help="Skip the certificate check of https targets (whitelisted targets only)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Split every request's service time into socket wait and client code (threads engine)")
+    parser.add_argument("--cprofile", metavar="FILE",
+                        help="Run the dispatcher and every worker under cProfile and dump the merged stats to FILE")
+    parser.add_argument("--ramp", choices=RAMP_MODES,
+                        help="Capacity search: step the arrival rate or the thread count up in stages until the SLO breaks")
+    parser.add_argument("--stages", type=int, default=DEFAULT_STAGES,
+                        help=f"Number of ramp stages (default: {DEFAULT_STAGES})")
+    parser.add_argument("--stage-seconds", type=float, default=DEFAULT_STAGE_SECONDS,
+                        help=f"How long each ramp stage holds its load (default: {DEFAULT_STAGE_SECONDS})")
+    parser.add_argument("--ramp-start", type=float,
+                        help="Load of the first stage: requests per second (rate, default: 2) or threads (threads, default: 1)")
+    parser.add_argument("--ramp-step", type=float,
+                        help="Load added per stage, in the same unit as --ramp-start (default: 2 req/s or 1 thread)")
+    parser.add_argument("--slo-p99-ms", type=float,
+                        help="Stop the ramp at the first stage whose p99 latency exceeds this many ms")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01,
+                        help="Stop the ramp at the first stage whose error rate exceeds this fraction (default: 0.01)")
     parser.add_argument("--bypass-whitelist", action="store_true", help="Bypass the whitelist check (use with caution)")
     
     args = parser.parse_args()
@@ -54,6 +689,39 @@ def main():
     total_requests = min(args.requests, MAX_REQUESTS)
     threads = min(args.threads, MAX_THREADS)
     delay = max(args.delay, MIN_DELAY)
+    processes = max(1, min(args.processes, threads, total_requests))
+    
+    live_metrics = args.metrics_file or args.metrics_port is not None
+    if processes > 1 and (args.progress or args.log or live_metrics):
+        print("\033[91mERROR: --progress, --log and live metrics need a single process; per-request output is off with --processes.\033[0m")
+        sys.exit(1)
+    
+    if args.insecure and (args.cafile or args.bypass_whitelist):
+        print("\033[91mERROR: --insecure is only for whitelisted targets and cannot be combined with --cafile.\033[0m")
+        sys.exit(1)
+    verify = False if args.insecure else args.cafile or True
+    if args.insecure:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    
+    if args.profile and args.engine != "threads":
+        print("\033[91mERROR: --profile needs the threads engine; --cprofile works with both.\033[0m")
+        sys.exit(1)
+    
+    stages = None
+    if args.ramp:
+        if args.profile:
+            print("\033[91mERROR: --ramp reports per stage; use --profile on a single run (--cprofile works with --ramp).\033[0m")
+            sys.exit(1)
+        if args.results_out or args.progress or args.log:
+            print("\033[91mERROR: --ramp reports per stage; it cannot be combined with --results-out, --progress or --log.\033[0m")
+            sys.exit(1)
+        try:
+            stages = plan_stages(args.ramp, args.stages, args.stage_seconds, args.threads, args.delay,
+                                 MAX_REQUESTS, MAX_THREADS, MIN_DELAY, args.ramp_start, args.ramp_step)
+        except ValueError as e:
+            print(f"\033[91mERROR: {e}\033[0m")
+            sys.exit(1)
+        total_requests = sum(stage.requests for stage in stages)
     
     # Display educational disclaimer
     print("\n" + "*"*80)
@@ -89,12 +757,79 @@ def main():
     print("3. In a production environment, proper rate limiting and error handling would be implemented")
     print("4. Load testing should always be performed with permission and care\n")
     
+    # Add a custom user agent to identify educational testing
+    headers = {
+        "User-Agent": "Educational-Load-Tester/1.0",
+        "X-Testing-Purpose": "Educational"
+    }
+    
+    # Every scenario URL must pass the same whitelist check as --url
+    workload = None
+    if args.scenario:
+        is_allowed = (lambda url: True) if args.bypass_whitelist else is_safe_target
+        try:
+            workload = load_workload(args.scenario, args.url, is_allowed, default_headers=headers)
+        except (OSError, ValueError) as e:
+            print(f"\033[91mERROR: Could not load scenario: {e}\033[0m")
+            sys.exit(1)
+        if stages is not None and workload.is_replay:
+            print("\033[91mERROR: --ramp sets the arrival rate itself; use a weighted scenario, not a trace.\033[0m")
+            sys.exit(1)
+    
+    # A warmup covering every request would leave nothing to report
+    if args.warmup > 0:
+        if stages is not None:
+            if any(count_warmup_requests(FixedRateSchedule(stage.delay), stage.requests, args.warmup) == stage.requests
+                   for stage in stages):
+                print("\033[91mERROR: --warmup must be shorter than a ramp stage (--stage-seconds); "
+                      "it would cover every request of a stage.\033[0m")
+                sys.exit(1)
+        else:
+            schedule, run_requests = build_schedule(workload, total_requests, delay)
+            if count_warmup_requests(schedule, run_requests, args.warmup) == run_requests:
+                print("\033[91mERROR: The warmup period covers every request of the run; "
+                      "shorten --warmup or send more requests.\033[0m")
+                sys.exit(1)
+    
     # Display test parameters
     print(f"Target URL: {args.url}")
     print(f"Number of requests: {total_requests}")
+    print(f"Engine: {args.engine}")
     print(f"Concurrent threads: {threads}")
+    if processes > 1:
+        print(f"Worker processes: {processes} (requests and threads split between them)")
     print(f"Request timeout: {args.timeout} seconds")
-    print(f"Thread creation delay: {delay} seconds\n")
+    if stages is not None:
+        print(f"Capacity search: {len(stages)} stages of {args.stage_seconds:g} seconds, ramping the {args.ramp}")
+        print(f"SLO: {SLO(args.slo_p99_ms, args.slo_error_rate).describe()}")
+        for stage in stages:
+            print(f"  Stage {stage.number}: {stage.threads} threads, {1 / stage.delay:.2f} req/s, {stage.requests} requests")
+    elif workload is not None and workload.is_replay:
+        print(f"Request timing: replayed from {args.scenario} (gaps of at least {MIN_DELAY} seconds)")
+    else:
+        print(f"Request interval: {delay} seconds (fixed-rate schedule)")
+    if workload is not None:
+        print(f"Scenario: {args.scenario} ({len(workload.endpoints)} endpoints)")
+    print(f"Connection mode: {args.connection}")
+    if args.results_out:
+        print(f"Per-request results: {args.results_out}")
+    if args.cafile:
+        print(f"TLS: certificates checked against {args.cafile}")
+    elif args.insecure:
+        print("TLS: certificate check skipped (--insecure)")
+    if args.verify_body:
+        print("Body verification: Content-Length and Content-Digest checked incrementally")
+    if args.profile:
+        print("Profiling: service time split into socket wait and client code")
+    if args.cprofile:
+        print(f"cProfile: merged stats of all threads{' and processes' if processes > 1 else ''} to {args.cprofile}")
+    if args.warmup > 0:
+        print(f"Warmup: first {args.warmup} seconds {'of every stage ' if stages is not None else ''}"
+              f"excluded from the final stats")
+    if args.quiet or args.progress:
+        print(f"Output: {'live progress line' if args.progress else 'quiet'}"
+              f"{f', per-request log in {args.log}' if args.log else ''}")
+    print()
     
     # Confirmation
     confirmation = input("Proceed with the test? (yes/no): ")
@@ -104,57 +839,45 @@ def main():
     
     print(f"\nSending {total_requests} requests to {args.url}...")
     
-    # Add a custom user agent to identify educational testing
-    headers = {
-        "User-Agent": "Educational-Load-Tester/1.0",
-        "X-Testing-Purpose": "Educational"
-    }
+    metrics = exporter = None
+    if live_metrics:
+        metrics = LoadTestMetrics()
+        try:
+            exporter = MetricsExporter(metrics.registry, args.metrics_file, args.metrics_port,
+                                       max(args.metrics_interval, 0.1)).start()
+        except OSError as e:
+            print(f"\033[91mERROR: Could not start the metrics exporter: {e}\033[0m")
+            sys.exit(1)
+        if exporter.url:
+            print(f"Live metrics: {exporter.url}")
+        if args.metrics_file:
+            print(f"Live metrics file: {args.metrics_file} (every {exporter.interval} seconds)")
     
-    start = time.time()
-    success_count = 0
-    error_count = 0
-    status_codes = {}
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-        # Submit tasks with a delay to prevent instant flooding
-        futures = []
-        for i in range(total_requests):
-            futures.append(executor.submit(send_request, args.url, args.timeout, headers))
-            if i < total_requests - 1:  # Don't sleep after the last request
-                time.sleep(delay)
+    profiles = ThreadProfiles(args.cprofile) if args.cprofile else None
+    if stages is not None:
+        run_ramp(args, stages, headers, workload, processes, metrics, profiles, verify)
+        if exporter is not None:
+            exporter.stop()
+    else:
+        sink = ResultSink(args.results_out) if args.results_out else None
+        log = open_request_log(args.log)
+        result = run_load_test(args.url, total_requests, threads, delay, args.timeout, engine=args.engine,
+                               connection=args.connection, headers=headers, sink=sink,
+                               verbose=not args.quiet, bypass_whitelist=args.bypass_whitelist, workload=workload,
+                               progress=args.progress, log=log, processes=processes, metrics=metrics,
+                               warmup=args.warmup, verify_body=args.verify_body, profile=args.profile,
+                               profiles=profiles, verify=verify)
+        if exporter is not None:
+            exporter.stop()
+        if sink is not None:
+            sink.close()
+        if log is not None:
+            log.close()
         
-        # Process results as they complete
-        for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
-            status = future.result()
-            print(f"[{i}/{total_requests}] Response: {status}")
-            
-            # Count successes and errors
-            if isinstance(status, int) and 200 <= status < 400:
-                success_count += 1
-            else:
-                error_count += 1
-            
-            # Track status code distribution
-            status_str = str(status)
-            status_codes[status_str] = status_codes.get(status_str, 0) + 1
-    
-    end = time.time()
-    duration = end - start
-    
-    # Print summary
-    print("\n" + "="*50)
-    print("TEST SUMMARY")
-    print("="*50)
-    print(f"Total requests: {total_requests}")
-    print(f"Successful responses: {success_count}")
-    print(f"Error responses: {error_count}")
-    print(f"Success rate: {(success_count/total_requests)*100:.2f}%")
-    print(f"Total duration: {duration:.2f} seconds")
-    print(f"Requests per second: {total_requests/duration:.2f}")
+        print_test_summary(result)
     
-    print("\nResponse code distribution:")
-    for status, count in status_codes.items():
-        print(f"  {status}: {count} ({count/total_requests*100:.2f}%)")
+    if profiles is not None:
+        print_cprofile(profiles)
     
     print("\nEDUCATIONAL NOTES:")
     print("1. This script demonstrates basic concurrent request handling")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+HTTP Probe - FOR EDUCATIONAL PURPOSES ONLY
+
+Sends a single HTTP or HTTPS request over a raw socket and times every phase
+of it with perf_counter_ns:
+
+- dns:     resolving the host name (getaddrinfo)
+- connect: the TCP three-way handshake
+- tls:     the TLS handshake (HTTPS only)
+- ttfb:    request sent -> status line and headers received
+- body:    reading the response body (counted through a reusable buffer,
+           optionally checked against Content-Length and Content-Digest)
+
+A high-level client such as requests hides these phases behind one number, so
+this probe is used whenever a latency regression has to be attributed to the
+network, the handshake or the request handler.
+
+For HTTPS, a TLS session from an earlier request can be passed in to attempt
+an abbreviated (resumed) handshake; the result says whether the server
+accepted it and carries the session to offer next time.
+"""
+
+import http.client
+import socket
+import ssl
+import time
+from collections import namedtuple
+
+from body_reader import BodyVerifier, readinto_body
+
+PHASES = ("dns", "connect", "tls", "ttfb", "body")
+
+PhaseTimings = namedtuple("PhaseTimings", PHASES + ("total",))
+
+ProbeResult = namedtuple(
+    "ProbeResult", "status headers size timings tls_version cipher tls_session session_reused alpn",
+    defaults=(None, False, None),
+)
+
+
+def unverified_tls_context():
+    """TLS context that accepts self-signed certificates (like verify=False)"""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    context.set_alpn_protocols(["http/1.1"])
+    return context
+
+
+def timed_http_request(host, port, path="/", headers=None, tls_context=None, timeout=5, tls_session=None,
+                       verify_body=False):
+    """Send one GET request on a new connection and return a ProbeResult
+
+    tls_session is an ssl.SSLSession from an earlier result to resume. With
+    verify_body, a body that does not match its headers raises
+    BodyVerificationError.
+    """
+    start_ns = time.perf_counter_ns()
+    family, socktype, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    dns_ns = time.perf_counter_ns()
+
+    sock = socket.socket(family, socktype, proto)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        connect_ns = time.perf_counter_ns()
+
+        tls_version = cipher = alpn = None
+        session_reused = False
+        if tls_context is not None:
+            sock = tls_context.wrap_socket(sock, server_hostname=host, session=tls_session)
+            tls_version = sock.version()
+            cipher = sock.cipher()[0]
+            alpn = sock.selected_alpn_protocol()
+            session_reused = sock.session_reused
+        tls_ns = time.perf_counter_ns()
+
+        lines = [f"GET {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+        response = http.client.HTTPResponse(sock, method="GET")
+        response.begin()
+        ttfb_ns = time.perf_counter_ns()
+
+        verifier = BodyVerifier(response.getheader) if verify_body else None
+        size = readinto_body(response.readinto, verifier)
+        end_ns = time.perf_counter_ns()
+        response_headers = response.getheaders()
+        # TLS 1.3 tickets arrive after the handshake, so read the session last
+        new_session = sock.session if tls_context is not None else None
+        response.close()
+    finally:
+        sock.close()
+
+    timings = PhaseTimings(
+        dns=dns_ns - start_ns,
+        connect=connect_ns - dns_ns,
+        tls=tls_ns - connect_ns,
+        ttfb=ttfb_ns - tls_ns,
+        body=end_ns - ttfb_ns,
+        total=end_ns - start_ns,
+    )
+    return ProbeResult(response.status, response_headers, size, timings, tls_version, cipher,
+                       new_session, session_reused, alpn)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Latency Histogram - FOR EDUCATIONAL PURPOSES ONLY
+
+A fixed-size, log-bucketed latency histogram in the spirit of HdrHistogram.
+
+Every power of two is split into a fixed number of linear sub-buckets, so the
+relative error of any recorded value is bounded while the memory used never
+depends on how many values are recorded. Percentiles are reported as the
+upper bound of their bucket, so they never understate a latency and overstate
+it by less than 2 ** (1 - sub_bucket_bits): under 1.6% with the default 7
+sub-bucket bits. Histograms with the same layout can be merged, which lets each
+worker keep its own histogram and combine them at the end of a run.
+
+SlidingWindowHistogram keeps a small ring of such histograms, one per time
+slot, so recent percentiles can be read while a run is still going.
+"""
+
+import threading
+import time
+from array import array
+
+# Default layout: values in nanoseconds, up to one hour, < 1.6% relative error
+DEFAULT_MAX_VALUE_NS = 3600 * 1_000_000_000
+DEFAULT_SUB_BUCKET_BITS = 7
+
+# Percentiles shown in summaries
+SUMMARY_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of non-negative integer values (nanoseconds)"""
+
+    def __init__(self, max_value=DEFAULT_MAX_VALUE_NS, sub_bucket_bits=DEFAULT_SUB_BUCKET_BITS):
+        self.max_value = max_value
+        self.sub_bucket_bits = sub_bucket_bits
+        self._sub_count = 1 << sub_bucket_bits
+        self._half_count = self._sub_count >> 1
+
+        # Values below _sub_count are stored exactly, every power of two above
+        # that gets _half_count buckets
+        max_shift = max(max_value.bit_length() - sub_bucket_bits, 0)
+        self._max_index = self._sub_count + max_shift * self._half_count - 1
+        self.counts = array("q", bytes(8 * (self._max_index + 1)))
+
+        self.total_count = 0
+        self.total_value = 0
+        self.min_value = None
+        self.max_recorded = 0
+
+    def _index_for(self, value):
+        """Return the bucket index for a value"""
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        index = self._sub_count + (shift - 1) * self._half_count + ((value >> shift) - self._half_count)
+        return min(index, self._max_index)
+
+    def _value_for(self, index):
+        """Return the highest value that falls into a bucket"""
+        if index < self._sub_count:
+            return index
+        shift, offset = divmod(index - self._sub_count, self._half_count)
+        shift += 1
+        return (((offset + self._half_count) + 1) << shift) - 1
+
+    def bucket_upper_bounds(self):
+        """Return the highest value of every bucket, in index order"""
+        return [self._value_for(index) for index in range(self._max_index + 1)]
+
+    def record(self, value, count=1):
+        """Record a value (clamped to the trackable range)"""
+        if value < 0:
+            value = 0
+        self.counts[self._index_for(value)] += count
+        self.total_count += count
+        self.total_value += value * count
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if value > self.max_recorded:
+            self.max_recorded = value
+
+    def merge(self, other):
+        """Add all values recorded in another histogram with the same layout"""
+        if (other.max_value, other.sub_bucket_bits) != (self.max_value, self.sub_bucket_bits):
+            raise ValueError("Cannot merge histograms with different layouts")
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.total_count += other.total_count
+        self.total_value += other.total_value
+        if other.min_value is not None and (self.min_value is None or other.min_value < self.min_value):
+            self.min_value = other.min_value
+        if other.max_recorded > self.max_recorded:
+            self.max_recorded = other.max_recorded
+        return self
+
+    def percentile(self, percent):
+        """Return the value at the given percentile (0-100)"""
+        if self.total_count == 0:
+            return 0
+        if percent >= 100.0:
+            return self.max_recorded
+        target = max(1, int(self.total_count * percent / 100.0 + 0.5))
+        running = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                running += count
+                if running >= target:
+                    return min(self._value_for(index), self.max_recorded)
+        return self.max_recorded
+
+    def mean(self):
+        """Return the mean of all recorded values"""
+        return self.total_value / self.total_count if self.total_count else 0.0
+
+    def format_summary(self, indent="  ", unit_ns=1_000_000, unit="ms"):
+        """Return summary lines with the percentiles used for capacity decisions"""
+        if self.total_count == 0:
+            return [f"{indent}No latency samples recorded"]
+        lines = [f"{indent}Samples: {self.total_count}"]
+        lines.append(f"{indent}Min: {self.min_value / unit_ns:.3f} {unit}")
+        lines.append(f"{indent}Mean: {self.mean() / unit_ns:.3f} {unit}")
+        for percent in SUMMARY_PERCENTILES:
+            lines.append(f"{indent}p{percent:g}: {self.percentile(percent) / unit_ns:.3f} {unit}")
+        lines.append(f"{indent}Max: {self.max_recorded / unit_ns:.3f} {unit}")
+        return lines
+
+
+class PerThreadHistograms:
+    """One histogram per worker thread, merged when the run is summarised"""
+
+    def __init__(self, **layout):
+        self._layout = layout
+        self._local = threading.local()
+        self._histograms = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the calling thread's histogram, creating it on first use"""
+        histogram = getattr(self._local, "histogram", None)
+        if histogram is None:
+            histogram = LatencyHistogram(**self._layout)
+            self._local.histogram = histogram
+            with self._lock:
+                self._histograms.append(histogram)
+        return histogram
+
+    def add(self, histogram):
+        """Include a histogram recorded elsewhere, e.g. in a worker process"""
+        with self._lock:
+            self._histograms.append(histogram)
+
+    def merged(self):
+        """Return a new histogram combining every worker's histogram"""
+        result = LatencyHistogram(**self._layout)
+        with self._lock:
+            for histogram in self._histograms:
+                result.merge(histogram)
+        return result
+
+
+class SlidingWindowHistogram:
+    """Histogram of the values recorded during the last window_seconds
+
+    The window is a ring of per-slot histograms; a slot is cleared when the
+    clock comes back round to it, so old values age out without any work per
+    recorded value. Safe to record into from several threads.
+    """
+
+    def __init__(self, window_seconds=5.0, slots=5, **layout):
+        self._layout = layout
+        self.window_ns = int(window_seconds * 1_000_000_000)
+        self._slot_ns = self.window_ns // slots
+        self._slot_ids = [-1] * slots
+        self._histograms = [LatencyHistogram(**layout) for _ in range(slots)]
+        self._lock = threading.Lock()
+        self.total_count = 0
+
+    def record(self, value):
+        slot_id = time.perf_counter_ns() // self._slot_ns
+        index = slot_id % len(self._histograms)
+        with self._lock:
+            if self._slot_ids[index] != slot_id:
+                self._slot_ids[index] = slot_id
+                self._histograms[index] = LatencyHistogram(**self._layout)
+            self._histograms[index].record(value)
+            self.total_count += 1
+
+    def snapshot(self):
+        """Return a new histogram of the values still inside the window"""
+        oldest = time.perf_counter_ns() // self._slot_ns - len(self._histograms) + 1
+        result = LatencyHistogram(**self._layout)
+        with self._lock:
+            for slot_id, histogram in zip(self._slot_ids, self._histograms):
+                if slot_id >= oldest:
+                    result.merge(histogram)
+        return result
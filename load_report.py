@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Load Test Report - FOR EDUCATIONAL PURPOSES ONLY
+
+Offline analysis of the per-request JSONL files written by
+controlled_load_tester.py --results-out.
+
+Usage:
+    python load_report.py report run.jsonl [more.jsonl ...] [--bucket 1.0]
+    python load_report.py compare before.jsonl after.jsonl [--bootstrap 2000]
+
+Records are loaded column by column into NumPy arrays instead of as one
+Python object per row: the numeric fields of the whole file are parsed by
+NumPy in a single call, so files with millions of records load in seconds.
+Files in another layout fall back to line-by-line JSON parsing.
+
+"compare" reports the difference between two runs together with a bootstrap
+confidence interval. The bootstrap resamples a fine log-bucketed latency
+histogram (the latency_histogram.py layout with 10 sub-bucket bits) rather
+than the raw samples, so thousands of resamples of a large run stay cheap;
+the price is a bounded bucket error of under 0.2% (2 ** -9).
+"""
+
+import argparse
+import json
+import re
+import sys
+
+import numpy as np
+
+from latency_histogram import SUMMARY_PERCENTILES, LatencyHistogram
+
+FIELDS = ("intended_ns", "start_ns", "latency_ns", "status", "bytes")
+
+# ResultSink writes every record with the same key order, so the numeric
+# fields can be parsed in one pass: drop the keys and the error strings,
+# turn the JSON punctuation into spaces and let NumPy parse the numbers
+_RECORD_KEYS = list(FIELDS) + ["error"]
+_NUMERIC_TABLE = bytes.maketrans(b",:{}\n\r\t", b" " * 7)
+_NON_NUMERIC = bytes(b for b in range(256) if b not in b"0123456789- ,:{}\n\r\t")
+_ERROR_PATTERN = re.compile(rb'"error":("(?:[^"\\]|\\.)*")')
+# Scenario runs append the endpoint name to every record
+_ENDPOINT_PATTERN = re.compile(rb',"endpoint":("(?:[^"\\]|\\.)*")')
+# Keys ResultSink may append after _RECORD_KEYS: the endpoint name of
+# scenario runs, then the socket wait of --profile runs (numeric, ignored here)
+# Warmup requests end with this marker (see result_sink.py)
+_WARMUP_MARKER = b'"warmup":true'
+_WARMUP_PATTERN = re.compile(rb',"warmup":true(?=\})')
+_EXTRA_KEY_LAYOUTS = ([], ["endpoint"], ["socket_wait_ns"], ["endpoint", "socket_wait_ns"])
+
+# Finer than the default layout: bucket error of the bootstrap is < 0.2%
+BOOTSTRAP_SUB_BUCKET_BITS = 10
+# A percentile is only compared when both runs have at least this many
+# samples above it; below that the bootstrap just resamples the maximum
+MIN_TAIL_SAMPLES = 10
+BOOTSTRAP_CHUNK = 250
+
+
+class RunData:
+    """Column arrays for one or more result files"""
+
+    def __init__(self, columns, errors, label, endpoints=None):
+        self.label = label
+        # Warmup requests left out by load_runs()
+        self.warmup_excluded = 0
+        self.intended_ns = columns["intended_ns"]
+        self.start_ns = columns["start_ns"]
+        self.latency_ns = columns["latency_ns"]
+        self.status = columns["status"]
+        self.bytes = columns["bytes"]
+        self.errors = errors
+        # Per-record endpoint name ("" outside scenario runs)
+        self.endpoints = endpoints if endpoints is not None else np.full(len(errors), "", dtype=object)
+        self.end_ns = self.intended_ns + self.latency_ns
+
+    def __len__(self):
+        return len(self.latency_ns)
+
+    @property
+    def success(self):
+        # Records without a status and without an error are successful
+        # non-HTTP requests, e.g. the simulator's TCP connects
+        return ((self.status >= 200) & (self.status < 400)) | ((self.status == 0) & (self.errors == ""))
+
+    @property
+    def duration(self):
+        if len(self) == 0:
+            return 0.0
+        return (self.end_ns.max() - self.intended_ns.min()) / 1e9
+
+    def outcome_counts(self):
+        """(label, count) pairs: status codes, then error classes, most common first"""
+        answered = self.status > 0
+        codes, code_counts = np.unique(self.status[answered], return_counts=True)
+        errors, error_counts = np.unique(self.errors[~answered].astype(str), return_counts=True)
+        labels = [str(code) for code in codes] + [str(error) or "ok" for error in errors]
+        counts = np.concatenate((code_counts, error_counts))
+        return [(labels[i], int(counts[i])) for i in np.argsort(-counts, kind="stable")]
+
+    def endpoint_names(self):
+        """Endpoint names in order of first appearance"""
+        return list(dict.fromkeys(name for name in self.endpoints if name))
+
+
+def _load_rows(data):
+    """Slow path for files in another layout: one json.loads per line"""
+    rows = [json.loads(line) for line in data.splitlines() if line.strip()]
+    columns = {
+        field: np.fromiter((row.get(field) or 0 for row in rows), dtype=np.int64, count=len(rows))
+        for field in FIELDS
+    }
+    errors = np.array([row.get("error") or "" for row in rows], dtype=object)
+    endpoints = np.array([row.get("endpoint") or "" for row in rows], dtype=object)
+    warmup = np.array([bool(row.get("warmup")) for row in rows], dtype=bool)
+    return columns, errors, endpoints, warmup
+
+
+def load_columns(path):
+    """Load one JSONL result file into column arrays
+
+    Returns (columns, errors, endpoints, warmup), where warmup marks the
+    requests sent during the load tester's --warmup.
+    """
+    with open(path, "rb") as f:
+        original = data = f.read()
+    if not data or data.isspace():
+        empty = np.zeros(0, dtype=object)
+        return {field: np.zeros(0, dtype=np.int64) for field in FIELDS}, empty, empty, np.zeros(0, dtype=bool)
+    line_count = data.count(b"\n") + (not data.endswith(b"\n"))
+    keys = [key for key in json.loads(data.split(b"\n", 1)[0]) if key != "warmup"]
+    extra_keys = keys[len(_RECORD_KEYS):]
+    if keys[:len(_RECORD_KEYS)] != _RECORD_KEYS or extra_keys not in _EXTRA_KEY_LAYOUTS:
+        return _load_rows(original)
+
+    # Warmup records end with "warmup":true; find their lines, then drop the key
+    warmup = np.zeros(line_count, dtype=bool)
+    if _WARMUP_MARKER in data:
+        newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+        positions = [match.start() for match in _WARMUP_PATTERN.finditer(data)]
+        warmup[np.searchsorted(newlines, positions)] = True
+        data = _WARMUP_PATTERN.sub(b"", data)
+
+    if "endpoint" not in extra_keys:
+        endpoints = np.full(line_count, "", dtype=object)
+    else:
+        raw_endpoints = _ENDPOINT_PATTERN.findall(data)
+        if len(raw_endpoints) != line_count:
+            return _load_rows(original)
+        # Few distinct names: decode each one once
+        names = {raw: json.loads(raw) for raw in set(raw_endpoints)}
+        endpoints = np.array([names[raw] for raw in raw_endpoints], dtype=object)
+        data = _ENDPOINT_PATTERN.sub(b"", data)
+
+    numeric = data.replace(b'"error":null', b"").replace(b"null", b"0")
+    values = np.fromstring(numeric.translate(_NUMERIC_TABLE, _NON_NUMERIC), dtype=np.int64, sep=" ")
+    values_per_record = len(FIELDS) + ("socket_wait_ns" in extra_keys)
+    if values.size != line_count * values_per_record:
+        # e.g. an error class name containing digits
+        return _load_rows(original)
+    values = values.reshape(line_count, values_per_record)
+    columns = {field: values[:, index] for index, field in enumerate(FIELDS)}
+
+    # Only failed requests carry an error name, and they are exactly the
+    # records without a status code
+    raw_errors = _ERROR_PATTERN.findall(data)
+    failed = columns["status"] == 0
+    if len(raw_errors) != int(failed.sum()):
+        return _load_rows(original)
+    errors = np.full(line_count, "", dtype=object)
+    errors[failed] = [json.loads(error) for error in raw_errors]
+    return columns, errors, endpoints, warmup
+
+
+def load_runs(paths, include_warmup=False):
+    """Load and concatenate one or more result files, by default without warmup requests"""
+    loaded = [load_columns(path) for path in paths]
+    columns = {field: np.concatenate([c[field] for c, _, _, _ in loaded]) for field in FIELDS}
+    errors = np.concatenate([e for _, e, _, _ in loaded])
+    endpoints = np.concatenate([n for _, _, n, _ in loaded])
+    warmup = np.concatenate([w for _, _, _, w in loaded])
+    if include_warmup or not warmup.any():
+        return RunData(columns, errors, ", ".join(paths), endpoints)
+    keep = ~warmup
+    columns = {field: column[keep] for field, column in columns.items()}
+    run = RunData(columns, errors[keep], ", ".join(paths), endpoints[keep])
+    run.warmup_excluded = int(warmup.sum())
+    return run
+
+
+def latency_histogram_counts(latency_ns, layout=None):
+    """Bucket latencies with the LatencyHistogram layout, fully vectorised
+
+    Returns (counts, bucket_upper_bounds) as arrays.
+    """
+    layout = layout or LatencyHistogram()
+    bits = layout.sub_bucket_bits
+    sub_count = 1 << bits
+    half_count = sub_count >> 1
+    bounds = np.array(layout.bucket_upper_bounds(), dtype=np.int64)
+
+    values = np.clip(latency_ns, 0, None)
+    _, bit_length = np.frexp(values.astype(np.float64))
+    shift = np.maximum(bit_length.astype(np.int64) - bits, 1)
+    indices = np.where(
+        values < sub_count,
+        values,
+        sub_count + (shift - 1) * half_count + ((values >> shift) - half_count),
+    )
+    indices = np.minimum(indices, len(bounds) - 1)
+    return np.bincount(indices, minlength=len(bounds)), bounds
+
+
+def summarize(run):
+    """Compute the summary main() prints, plus percentiles"""
+    total = len(run)
+    duration = run.duration
+    return {
+        "total": total,
+        "success": int(run.success.sum()),
+        "duration": duration,
+        "rps": total / duration if duration > 0 else 0.0,
+        "bytes": int(run.bytes.sum()),
+        "distribution": run.outcome_counts(),
+        "percentiles": dict(zip(
+            SUMMARY_PERCENTILES, np.percentile(run.latency_ns, SUMMARY_PERCENTILES) if total else [0] * 4
+        )),
+        "max": int(run.latency_ns.max()) if total else 0,
+    }
+
+
+def time_series(run, bucket_seconds):
+    """Per time bucket: completions, throughput, mean and p99 latency
+
+    Requests are bucketed by completion time. The per-bucket p99 is computed
+    without a Python loop by sorting on (bucket, latency) and indexing into
+    each bucket's slice.
+    """
+    if len(run) == 0:
+        return []
+    bucket_ns = int(bucket_seconds * 1e9)
+    buckets = (run.end_ns - run.intended_ns.min()) // bucket_ns
+    counts = np.bincount(buckets)
+    sums = np.bincount(buckets, weights=run.latency_ns)
+
+    order = np.lexsort((run.latency_ns, buckets))
+    sorted_latency = run.latency_ns[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    nonempty = counts > 0
+    p99_index = starts + np.maximum(np.ceil(counts * 0.99).astype(np.int64) - 1, 0)
+    p99 = np.where(nonempty, sorted_latency[np.minimum(p99_index, len(sorted_latency) - 1)], 0)
+    mean = np.divide(sums, counts, out=np.zeros(len(counts)), where=nonempty)
+
+    return [
+        (index * bucket_seconds, int(counts[index]), counts[index] / bucket_seconds, mean[index], int(p99[index]))
+        for index in range(len(counts))
+    ]
+
+
+def bootstrap_percentiles(latency_ns, percentiles, resamples, rng):
+    """Bootstrap distribution of percentiles by resampling histogram buckets
+
+    Returns an array of shape (resamples, len(percentiles)).
+    """
+    layout = LatencyHistogram(sub_bucket_bits=BOOTSTRAP_SUB_BUCKET_BITS)
+    counts, bounds = latency_histogram_counts(latency_ns, layout)
+    total = int(counts.sum())
+    used = counts > 0
+    counts, bounds = counts[used], bounds[used]
+    targets = [max(1, int(total * percent / 100.0 + 0.5)) for percent in percentiles]
+    result = np.empty((resamples, len(percentiles)))
+    for first in range(0, resamples, BOOTSTRAP_CHUNK):
+        size = min(BOOTSTRAP_CHUNK, resamples - first)
+        cumulative = np.cumsum(rng.multinomial(total, counts / total, size=size), axis=1)
+        for column, target in enumerate(targets):
+            result[first:first + size, column] = bounds[np.argmax(cumulative >= target, axis=1)]
+    return result
+
+
+def print_summary(run, bucket_seconds):
+    summary = summarize(run)
+    total = summary["total"]
+    print("\n" + "="*50)
+    print("RUN REPORT")
+    print("="*50)
+    print(f"Files: {run.label}")
+    print(f"Total requests: {total}")
+    if run.warmup_excluded:
+        print(f"Warmup: {run.warmup_excluded} requests excluded (use --include-warmup to count them)")
+    print(f"Successful responses: {summary['success']}")
+    print(f"Error responses: {total - summary['success']}")
+    print(f"Success rate: {summary['success']/total*100 if total else 0:.2f}%")
+    print(f"Total duration: {summary['duration']:.2f} seconds")
+    print(f"Requests per second: {summary['rps']:.2f}")
+    print(f"Bytes received: {summary['bytes']}")
+
+    print("\nResponse code distribution:")
+    for label, count in summary["distribution"]:
+        print(f"  {label}: {count} ({count/total*100:.2f}%)")
+
+    print("\nLatency distribution (from intended start time):")
+    for percent, value in summary["percentiles"].items():
+        print(f"  p{percent:g}: {value / 1e6:.3f} ms")
+    print(f"  Max: {summary['max'] / 1e6:.3f} ms")
+
+    names = run.endpoint_names()
+    if names:
+        print("\nPer-endpoint breakdown (latency from intended start time):")
+        print(f"  {'ENDPOINT':<30} {'REQUESTS':>9} {'ERRORS':>7} {'P50 MS':>9} {'P99 MS':>9} {'MAX MS':>9}")
+        for name in names:
+            selected = run.endpoints == name
+            latency = run.latency_ns[selected]
+            errors = int((~run.success[selected]).sum())
+            p50, p99 = np.percentile(latency, [50, 99])
+            print(f"  {name:<30} {latency.size:>9} {errors:>7} {p50 / 1e6:>9.3f} {p99 / 1e6:>9.3f} {latency.max() / 1e6:>9.3f}")
+
+    print(f"\nTime series ({bucket_seconds:g} s buckets, by completion time):")
+    print(f"  {'T+SEC':>8} {'COUNT':>8} {'RPS':>9} {'MEAN MS':>9} {'P99 MS':>9}")
+    for start, count, rps, mean, p99 in time_series(run, bucket_seconds):
+        print(f"  {start:>8.1f} {count:>8} {rps:>9.2f} {mean / 1e6:>9.3f} {p99 / 1e6:>9.3f}")
+    print("="*50)
+
+
+def has_tail_samples(count, percent):
+    """Whether count samples leave enough above the percentile to compare it"""
+    return count * (1 - percent / 100.0) >= MIN_TAIL_SAMPLES
+
+
+def print_comparison(baseline, candidate, resamples, confidence, seed):
+    rng = np.random.default_rng(seed)
+    before = summarize(baseline)
+    after = summarize(candidate)
+
+    print("\n" + "="*70)
+    print("RUN COMPARISON")
+    print("="*70)
+    print(f"Baseline (A):  {baseline.label} ({before['total']} requests)")
+    print(f"Candidate (B): {candidate.label} ({after['total']} requests)")
+    if baseline.warmup_excluded or candidate.warmup_excluded:
+        print(f"Warmup requests excluded: {baseline.warmup_excluded} (A), {candidate.warmup_excluded} (B)")
+    print()
+
+    def rate(summary):
+        return summary["success"] / summary["total"] * 100 if summary["total"] else 0.0
+
+    print(f"  {'METRIC':<14} {'A':>11} {'B':>11} {'B - A':>11}")
+    print(f"  {'Success rate':<14} {rate(before):>10.2f}% {rate(after):>10.2f}% {rate(after) - rate(before):>+10.2f}%")
+    print(f"  {'Requests/sec':<14} {before['rps']:>11.2f} {after['rps']:>11.2f} {after['rps'] - before['rps']:>+11.2f}")
+
+    if not before["total"] or not after["total"]:
+        print("\nNot enough samples for a latency comparison.")
+        return
+
+    alpha = (100.0 - confidence) / 2
+    boot_a = bootstrap_percentiles(baseline.latency_ns, SUMMARY_PERCENTILES, resamples, rng)
+    boot_b = bootstrap_percentiles(candidate.latency_ns, SUMMARY_PERCENTILES, resamples, rng)
+    diffs = boot_b - boot_a
+
+    print(f"\nLatency difference, {confidence:g}% bootstrap CI ({resamples} resamples):")
+    print(f"  {'PCTL':<8} {'A MS':>9} {'B MS':>9} {'B - A MS':>10} {'CI LOW':>9} {'CI HIGH':>9}  VERDICT")
+    for column, percent in enumerate(SUMMARY_PERCENTILES):
+        a_value = before["percentiles"][percent] / 1e6
+        b_value = after["percentiles"][percent] / 1e6
+        low, high = np.percentile(diffs[:, column], [alpha, 100.0 - alpha]) / 1e6
+        if not (has_tail_samples(before["total"], percent) and has_tail_samples(after["total"], percent)):
+            verdict = "insufficient samples"
+        elif low > 0:
+            verdict = "B slower"
+        elif high < 0:
+            verdict = "B faster"
+        else:
+            verdict = "no significant change"
+        print(f"  p{percent:<7g} {a_value:>9.3f} {b_value:>9.3f} {b_value - a_value:>+10.3f} "
+              f"{low:>+9.3f} {high:>+9.3f}  {verdict}")
+    print("="*70)
+    print("\nNOTE: A change is only reported when the confidence interval excludes zero.")
+    print(f"Percentiles with fewer than {MIN_TAIL_SAMPLES} samples above them in either run get no verdict.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline report and comparison of load test result files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    report_parser = subparsers.add_parser("report", help="Summarise one or more result files")
+    report_parser.add_argument("files", nargs="+", help="JSONL files written with --results-out")
+    report_parser.add_argument("--bucket", type=float, default=1.0, help="Time-series bucket size in seconds (default: 1.0)")
+    report_parser.add_argument("--include-warmup", action="store_true",
+                               help="Count the requests the load tester marked as warmup")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare a baseline run with a candidate run")
+    compare_parser.add_argument("baseline", help="Result file of the baseline run (A)")
+    compare_parser.add_argument("candidate", help="Result file of the candidate run (B)")
+    compare_parser.add_argument("--bootstrap", type=int, default=2000, help="Number of bootstrap resamples (default: 2000)")
+    compare_parser.add_argument("--confidence", type=float, default=95.0, help="Confidence level in percent (default: 95)")
+    compare_parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible intervals")
+    compare_parser.add_argument("--include-warmup", action="store_true",
+                                help="Count the requests the load tester marked as warmup")
+
+    args = parser.parse_args()
+
+    if args.command == "report":
+        print_summary(load_runs(args.files, args.include_warmup), args.bucket)
+    else:
+        print_comparison(load_runs([args.baseline], args.include_warmup),
+                         load_runs([args.candidate], args.include_warmup),
+                         args.bootstrap, args.confidence, args.seed)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (OSError, ValueError) as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Local Target Server - FOR EDUCATIONAL PURPOSES ONLY
+
+A small, configurable stand-in server to point controlled_load_tester.py and
+network_protocol_simulator.py at. It only binds to localhost, matching the
+whitelists of both tools.
+
+Every response can be shaped:
+
+- --latency-ms / --jitter-ms: time the handler waits before answering
+- --size: size of the generated response body in bytes
+- --payload: serve a file instead (e.g. dignityevents.html)
+- --root: serve a directory of static files instead (a page and its
+  stylesheets, fonts and images, for page_load_benchmark.py)
+- --error-rate / --error-status: fraction of requests answered with an error
+- --corrupt-rate: fraction of bodies with one byte flipped (the
+  Content-Digest header still describes the intact body)
+- --tls: serve HTTPS with a self-signed certificate
+
+Every 200 response carries an ETag and a Last-Modified validator, and
+conditional requests (If-None-Match, If-Modified-Since) for an unchanged
+resource are answered with 304 Not Modified and no body, so the cost and
+savings of HTTP cache revalidation can be measured locally. Each response
+also carries a Content-Digest header (SHA-256, computed once at
+startup) for clients that verify bodies, and an X-Server-Time-Ns header with
+the time the handler spent on it, and the server keeps a histogram of those times, so clients can
+tell their own overhead apart from the injected latency.
+
+Usage:
+    python local_target_server.py --port 8080 --latency-ms 5 --payload dignityevents.html
+"""
+
+import argparse
+import hashlib
+import mimetypes
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from urllib.parse import unquote, urlsplit
+
+from body_reader import content_digest_header
+from latency_histogram import PerThreadHistograms
+
+ALLOWED_HOSTS = ["127.0.0.1", "localhost"]  # Never listen on external interfaces
+
+
+class StaticResource:
+    """A response body with its validators, built once and served many times"""
+
+    def __init__(self, body, content_type, mtime):
+        self.body = body
+        self.content_type = content_type
+        self.mtime = int(mtime)
+        self.digest = content_digest_header(body)
+        # Strong validator derived from the body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+        # Same length, one byte flipped, served with the intact body's digest
+        corrupted = bytearray(body)
+        if corrupted:
+            corrupted[len(corrupted) // 2] ^= 0xFF
+        self.corrupted_body = bytes(corrupted)
+
+    def is_not_modified(self, headers):
+        """Whether a conditional request can be answered with 304"""
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match is not None:
+            # If-None-Match takes precedence; weak comparison, as for GET
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+        if_modified_since = headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= self.mtime
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class StaticRoot:
+    """Files under a directory, cached in memory until they change on disk"""
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        if not os.path.isdir(self.root):
+            raise ValueError(f"Not a directory: {root}")
+        self._cache = {}  # path -> ((mtime_ns, size), StaticResource)
+        self._lock = threading.Lock()
+
+    def lookup(self, request_path):
+        """Return the StaticResource for a request path, or None if there is no such file"""
+        relative = unquote(urlsplit(request_path).path).lstrip("/")
+        path = os.path.realpath(os.path.join(self.root, relative))
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        # Never serve anything outside the root
+        if os.path.commonpath([self.root, path]) != self.root:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+            content_type += "; charset=utf-8"
+        resource = StaticResource(body, content_type, stat.st_mtime)
+        with self._lock:
+            self._cache[path] = (key, resource)
+        return resource
+
+
+class TargetServerConfig:
+    """Response shaping settings for the local target server"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, size=1024, payload=None,
+                 error_rate=0.0, error_status=500, content_type="text/plain", corrupt_rate=0.0, root=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.corrupt_rate = corrupt_rate
+        self.static_root = StaticRoot(root) if root is not None else None
+        if payload is not None:
+            with open(payload, "rb") as f:
+                body = f.read()
+            content_type = "text/html; charset=utf-8" if payload.endswith(".html") else "application/octet-stream"
+            mtime = os.path.getmtime(payload)
+        else:
+            body = (b"Educational load test payload.\n" * (size // 31 + 1))[:size]
+            mtime = time.time()
+        self.resource = StaticResource(body, content_type, mtime)
+
+    @property
+    def body(self):
+        return self.resource.body
+
+    def lookup(self, request_path):
+        """The resource to serve for a request path (None: 404)"""
+        if self.static_root is not None:
+            return self.static_root.lookup(request_path)
+        return self.resource
+
+
+class TargetRequestHandler(BaseHTTPRequestHandler):
+    """Answers every GET/HEAD/POST according to the server's config"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "EducationalTargetServer/1.0"
+    # Headers and body are separate writes; with Nagle's algorithm the body of
+    # every later response on a kept-alive connection waits for the client's
+    # delayed ACK (~40 ms), which would dominate the measured latencies
+    disable_nagle_algorithm = True
+
+    def _respond(self, send_body=True):
+        start_ns = time.perf_counter_ns()
+        config = self.server.config
+
+        # Drain any request body so the connection can be reused
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        delay_ms = config.latency_ms
+        if config.jitter_ms:
+            delay_ms += random.uniform(0, config.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+        resource = None
+        if config.error_rate and random.random() < config.error_rate:
+            status, body, content_type = config.error_status, b"Injected error\n", "text/plain"
+        else:
+            resource = config.lookup(self.path)
+            if resource is None:
+                status, body, content_type = 404, b"Not found\n", "text/plain"
+            elif resource.is_not_modified(self.headers):
+                status, body, content_type = 304, b"", None
+            else:
+                status, body, content_type = 200, resource.body, resource.content_type
+                if config.corrupt_rate and random.random() < config.corrupt_rate:
+                    body = resource.corrupted_body
+
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        if resource is not None:
+            self.send_header("ETag", resource.etag)
+            self.send_header("Last-Modified", resource.last_modified)
+            self.send_header("Cache-Control", "no-cache")
+            if status == 200:
+                self.send_header("Content-Digest", resource.digest)
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        self.send_header("X-Server-Time-Ns", str(elapsed_ns))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+        self.server.handler_times.get().record(elapsed_ns)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def generate_self_signed_cert(directory):
+    """Create a throwaway self-signed certificate for localhost and 127.0.0.1 with openssl"""
+    if shutil.which("openssl") is None:
+        raise RuntimeError("openssl is required to generate a certificate; pass --certfile/--keyfile instead")
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+         "-keyout", keyfile, "-out", certfile],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return certfile, keyfile
+
+
+class LocalTargetServer:
+    """Threaded local HTTP(S) server that can be started from other scripts"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0, tls=False,
+                 certfile=None, keyfile=None, verbose=False):
+        if host not in ALLOWED_HOSTS:
+            raise ValueError(f"The local target server only listens on: {', '.join(ALLOWED_HOSTS)}")
+        self.tls = tls
+        self.certfile = None
+        self._tempdir = None
+        self.httpd = ThreadingHTTPServer((host, port), TargetRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or TargetServerConfig()
+        self.httpd.handler_times = PerThreadHistograms()
+        self.httpd.verbose = verbose
+        if tls:
+            if certfile is None:
+                self._tempdir = tempfile.TemporaryDirectory()
+                certfile, keyfile = generate_self_signed_cert(self._tempdir.name)
+            self.certfile = certfile
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            context.set_alpn_protocols(["http/1.1"])
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    @property
+    def url(self):
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://127.0.0.1:{self.port}/"
+
+    @property
+    def handler_times(self):
+        """Merged histogram of time spent in the request handler"""
+        return self.httpd.handler_times.merged()
+
+    def start(self):
+        """Serve in a background thread and return the base URL"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="target-server", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """Stop the background thread started by start() and close the server"""
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.close()
+
+    def close(self):
+        self.httpd.server_close()
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
+            self._tempdir = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local target server for the educational network tools")
+    parser.add_argument("--host", default="127.0.0.1", choices=ALLOWED_HOSTS, help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected latency per request in ms (default: 0)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random latency of up to N ms (default: 0)")
+    parser.add_argument("--size", type=int, default=1024, help="Generated response body size in bytes (default: 1024)")
+    parser.add_argument("--payload", help="Serve this file as the response body (e.g. dignityevents.html)")
+    parser.add_argument("--root", help="Serve static files from this directory (/ serves index.html)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error (default: 0)")
+    parser.add_argument("--error-status", type=int, default=500, help="Status code of injected errors (default: 500)")
+    parser.add_argument("--corrupt-rate", type=float, default=0.0,
+                        help="Fraction of response bodies with one byte flipped, to test body verification (default: 0)")
+    parser.add_argument("--tls", action="store_true", help="Serve HTTPS with a self-signed certificate")
+    parser.add_argument("--certfile", help="Certificate to use with --tls instead of generating one")
+    parser.add_argument("--keyfile", help="Private key to use with --tls")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request")
+
+    args = parser.parse_args()
+
+    config = TargetServerConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        size=args.size,
+        payload=args.payload,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        corrupt_rate=args.corrupt_rate,
+        root=args.root,
+    )
+    server = LocalTargetServer(config, host=args.host, port=args.port, tls=args.tls,
+                               certfile=args.certfile, keyfile=args.keyfile, verbose=not args.quiet)
+    print(f"Serving {f'{args.root} ' if args.root else ''}on {server.url} "
+          f"(latency {args.latency_ms} ms, error rate {args.error_rate})")
+    if server.certfile:
+        print(f"Certificate: {server.certfile} (trust it with controlled_load_tester.py --cafile)")
+    print("Press Ctrl+C to stop.")
+    try:
+        server.httpd.serve_forever()
+    finally:
+        print("\nHandler time distribution:")
+        for line in server.handler_times.format_summary():
+            print(line)
+        server.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
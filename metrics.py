@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Live Metrics - FOR EDUCATIONAL PURPOSES ONLY
+
+A small in-process metrics registry (counters, gauges and histograms) and an
+exporter that publishes it in the Prometheus text format while a run is
+still going, either to a file that is atomically replaced every interval or
+on a tiny HTTP endpoint that only listens on localhost:
+
+    python controlled_load_tester.py --url http://localhost:8080 --metrics-file metrics.prom
+    python controlled_load_tester.py --url http://localhost:8080 --metrics-port 9100
+    curl http://127.0.0.1:9100/metrics
+
+Every snapshot carries its own timestamp, so client-side numbers can be
+lined up with server dashboards over the same time windows. The snapshot is
+rendered once per interval by the exporter thread, never by the threads
+sending requests.
+"""
+
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from latency_histogram import LatencyHistogram
+
+# Prometheus histogram bucket bounds for latencies, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DEFAULT_EXPORT_INTERVAL = 1.0
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    """Sample value in the Prometheus text format, floats at full precision"""
+    if not isinstance(value, float):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class Counter:
+    """Monotonically increasing value, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        if not values and not self.labels:
+            values[()] = 0
+        return [(self.name + _format_labels(self.labels, key), value) for key, value in values.items()]
+
+
+class Gauge:
+    """Value that can go up and down, or is read from a function at export time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def samples(self):
+        return [(self.name, self.function() if self.function is not None else self.value)]
+
+
+class Histogram:
+    """Latency histogram in nanoseconds, exported in seconds with cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._histogram = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return self._histogram.total_count
+
+    def observe(self, value_ns):
+        with self._lock:
+            self._histogram.record(value_ns)
+
+    def samples(self):
+        histogram = LatencyHistogram()
+        with self._lock:
+            histogram.merge(self._histogram)
+        # One pass over the log buckets; a bucket is counted towards the
+        # first bound at or above its upper edge
+        cumulative = []
+        running = 0
+        bound_index = 0
+        bounds_ns = [bound * 1_000_000_000 for bound in self.buckets]
+        for upper, count in zip(histogram.bucket_upper_bounds(), histogram.counts):
+            while bound_index < len(bounds_ns) and upper > bounds_ns[bound_index]:
+                cumulative.append(running)
+                bound_index += 1
+            running += count
+        cumulative += [running] * (len(bounds_ns) - bound_index)
+        samples = [(f'{self.name}_bucket{{le="{bound:g}"}}', count) for bound, count in zip(self.buckets, cumulative)]
+        samples.append((f'{self.name}_bucket{{le="+Inf"}}', histogram.total_count))
+        samples.append((f"{self.name}_sum", histogram.total_value / 1_000_000_000))
+        samples.append((f"{self.name}_count", histogram.total_count))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, function=None):
+        return self._add(Gauge(name, help_text, function))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class LoadTestMetrics:
+    """The load tester's metrics: requests, in flight, errors, bytes and latency"""
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter(
+            "loadtest_requests_total", "Completed requests by HTTP status (empty if the request failed)", ["status"])
+        self.errors = self.registry.counter(
+            "loadtest_errors_total", "Failed requests by exception class", ["class"])
+        self.bytes = self.registry.counter("loadtest_response_bytes_total", "Response body bytes received")
+        self.in_flight = self.registry.gauge(
+            "loadtest_in_flight_requests", "Requests dispatched but not completed")
+        self.latency = self.registry.histogram(
+            "loadtest_latency_seconds", "Latency from the intended start time")
+        self.registry.gauge("loadtest_snapshot_timestamp_seconds", "Unix time of this snapshot", time.time)
+
+    def dispatched(self):
+        """Count one request as in flight (called when it is dispatched)"""
+        self.in_flight.inc()
+
+    def record(self, latency_ns, status, size, error=None):
+        """Record one completed request (called from the measuring threads)"""
+        self.in_flight.dec()
+        self.requests.inc(1, "" if error else status)
+        if error:
+            self.errors.inc(1, error)
+        self.bytes.inc(size)
+        self.latency.observe(latency_ns)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.exporter.snapshot.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsExporter:
+    """Renders a registry every interval to a file and/or a localhost HTTP endpoint"""
+
+    def __init__(self, registry, path=None, port=None, interval=DEFAULT_EXPORT_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.snapshot = registry.render()
+        self._server = None
+        if port is not None:
+            # Localhost only: metrics are never exposed to the network
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            self._server.daemon_threads = True
+            self._server.exporter = self
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/metrics" if self._server else None
+
+    def start(self):
+        if self._server is not None:
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        self._thread.start()
+        return self
+
+    def export(self):
+        self.snapshot = self.registry.render()
+        if self.path:
+            # Write then rename, so readers never see a half-written file
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                f.write(self.snapshot)
+            os.replace(temp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def stop(self):
+        """Export a final snapshot and shut the endpoint down"""
+        self._stop.set()
+        self._thread.join()
+        self.export()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
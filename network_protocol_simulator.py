@@ -16,29 +16,61 @@ Usage:
 """
 
 import argparse
-import socket
-import ssl
-import time
+import concurrent.futures
 import sys
-import random
-import requests
+import threading
+import time
 from datetime import datetime
+from urllib.parse import urlparse
+
+from connection_pool import CONNECTION_MODES
+from latency_histogram import PerThreadHistograms
+from progress_reporter import ProgressReporter, open_request_log
+from protocol_drivers import DRIVERS, DriverResult
+from request_scheduler import FixedRateSchedule, LatencyRecorder, ReplaySchedule
+from result_sink import ResultSink
+from workload import load_workload
 
 # SAFETY FEATURES
 MAX_REQUESTS = 20  # Maximum number of requests allowed
 MIN_DELAY = 1.0    # Minimum delay between requests in seconds
+MAX_CONCURRENCY = 5  # Maximum number of requests in flight at once
 WHITELIST = ["127.0.0.1", "localhost"]  # Only allow local testing by default
 
 class ProtocolSimulator:
-    def __init__(self, target, port, protocol, num_requests, delay, path="/"):
+    """Shared timing and scheduling core for all protocol drivers
+    
+    Requests are started on a fixed-rate schedule (at most one per
+    MIN_DELAY) by a pool of up to MAX_CONCURRENCY workers. For every driver
+    the core times each request from its intended start, records latency
+    histograms (per endpoint in scenario runs), counts outcomes, prints or
+    logs the per-request detail, feeds the progress line and streams the
+    results file. The time the core itself spends per request after the
+    driver returns is recorded too, so its overhead is visible in the summary.
+    """
+    
+    def __init__(self, target, port, protocol, num_requests, delay, path="/", connection="reuse", phases=False,
+                 scenario=None, verbose=True, progress=False, log=None, concurrency=1, sink=None, tls_resume=False,
+                 verify_body=False):
         self.target = target
         self.port = port
         self.protocol = protocol.lower()
         self.num_requests = min(num_requests, MAX_REQUESTS)  # Safety limit
         self.delay = max(delay, MIN_DELAY)  # Safety limit
+        self.concurrency = max(1, min(concurrency, MAX_CONCURRENCY))  # Safety limit
         self.path = path
         self.sent_requests = 0
         self.successful_requests = 0
+        self.connection = connection
+        self.phases = phases
+        self.sink = sink
+        # Output modes: per-request detail on the console (verbose, the
+        # default), in a buffered log file, or nowhere; plus a live line
+        self.verbose = verbose and not progress
+        self.log = log
+        self.details = self.verbose or log is not None
+        self.show_progress = progress
+        self._lock = threading.Lock()
         
         # Safety check for target
         if target not in WHITELIST:
@@ -46,6 +78,43 @@ class ProtocolSimulator:
             print(f"For educational purposes, this script only allows connections to: {', '.join(WHITELIST)}")
             print("Edit the WHITELIST in the script if you need to test against other targets you control.")
             sys.exit(1)
+        
+        if self.protocol not in DRIVERS:
+            print(f"Unsupported protocol: {self.protocol}")
+            sys.exit(1)
+        options = {}
+        self.tls_resume = tls_resume
+        if tls_resume:
+            if self.protocol != "https":
+                print("\033[91mERROR: --tls-resume needs --protocol https.\033[0m")
+                sys.exit(1)
+            options["resume"] = True
+        self.verify_body = verify_body
+        if verify_body:
+            if self.protocol not in ("http", "https"):
+                print("\033[91mERROR: --verify-body needs --protocol http or https.\033[0m")
+                sys.exit(1)
+            options["verify_body"] = True
+        self.driver = DRIVERS[self.protocol](target, port, path=path, connection=connection, phases=phases,
+                                             pool_size=self.concurrency, **options)
+        
+        # Optional workload of weighted endpoints or a trace to replay
+        self.scenario = scenario
+        self.workload = None
+        self.endpoint_counts = {}  # endpoint name -> [requests, successes]
+        if scenario:
+            if self.phases or tls_resume or self.protocol not in ("http", "https"):
+                print("\033[91mERROR: --scenario works with --protocol http/https and without --phases or --tls-resume.\033[0m")
+                sys.exit(1)
+            base_url = f"{self.protocol}://{target}:{port}{path}"
+            try:
+                self.workload = load_workload(scenario, base_url, lambda url: urlparse(url).hostname in WHITELIST)
+            except (OSError, ValueError) as e:
+                print(f"\033[91mERROR: Could not load scenario: {e}\033[0m")
+                sys.exit(1)
+            if self.workload.is_replay:
+                self.num_requests = min(self.num_requests, len(self.workload.trace))
+            self.endpoint_counts = {name: [0, 0] for name in self.workload.names}
     
     def run_simulation(self):
         """Run the protocol simulation"""
@@ -55,163 +124,111 @@ class ProtocolSimulator:
         print(f"Target: {self.target}:{self.port}")
         print(f"Protocol: {self.protocol.upper()}")
         print(f"Requests: {self.num_requests}")
-        print(f"Delay: {self.delay} seconds")
+        if self.workload is not None and self.workload.is_replay:
+            print(f"Delay: replayed from {self.scenario} (at least {self.delay} seconds)")
+        else:
+            print(f"Delay: {self.delay} seconds (fixed-rate schedule)")
+        print(f"Concurrency: {self.concurrency}")
+        if self.workload is not None:
+            print(f"Scenario: {self.scenario} ({len(self.workload.endpoints)} endpoints)")
+        if self.protocol in ("http", "https"):
+            if self.tls_resume:
+                print("Connection mode: new, resuming the last TLS session")
+            else:
+                print(f"Connection mode: {'new (per-phase timing)' if self.phases else self.connection}")
+        if self.verify_body:
+            print("Body verification: Content-Length and Content-Digest checked incrementally")
         print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'='*60}\n")
         
-        if self.protocol == "http":
-            self.simulate_http()
-        elif self.protocol == "https":
-            self.simulate_https()
-        elif self.protocol == "icmp":
-            self.simulate_icmp()
+        print(f"Simulating {self.protocol.upper()} protocol...\n")
+        if self.protocol == "icmp":
+            print("Note: This is a simplified ICMP simulation for educational purposes.")
+            print("For a real ICMP implementation, you would need raw socket access (requires root/admin).\n")
+        
+        if self.workload is not None and self.workload.is_replay:
+            self.schedule = ReplaySchedule(self.workload.replay_offsets()[:self.num_requests], min_interval=self.delay)
         else:
-            print(f"Unsupported protocol: {self.protocol}")
-            return
+            self.schedule = FixedRateSchedule(self.delay)
+        self.progress = None
+        if self.show_progress:
+            self.progress = ProgressReporter(
+                self.num_requests,
+                lambda: (self.schedule.dispatch_lag.total_count, self.sent_requests - self.successful_requests),
+            )
+        self.recorder = LatencyRecorder(self.endpoint_counts, window=self.progress.window if self.progress else None)
+        self.core_overhead = PerThreadHistograms()
         
+        if self.progress is not None:
+            self.progress.start()
+        try:
+            self.run_schedule()
+        finally:
+            if self.progress is not None:
+                self.progress.stop()
+            self.driver.close()
         self.print_summary()
     
-    def simulate_http(self):
-        """Simulate HTTP requests"""
-        print("Simulating HTTP protocol...\n")
-        
-        for i in range(self.num_requests):
-            try:
-                start_time = time.time()
-                url = f"http://{self.target}:{self.port}{self.path}"
-                
-                print(f"Request {i+1}/{self.num_requests} to {url}")
-                
-                # Send the request with a random user agent for educational demonstration
-                headers = {"User-Agent": random.choice(USER_AGENTS)}
-                response = requests.get(url, headers=headers, timeout=5)
-                
-                elapsed = time.time() - start_time
-                self.sent_requests += 1
-                
-                # Process response
-                print(f"  Status: {response.status_code}")
-                print(f"  Time: {elapsed:.4f} seconds")
-                print(f"  Size: {len(response.content)} bytes")
-                
-                if 200 <= response.status_code < 400:
-                    self.successful_requests += 1
-                
-                # Educational output - show headers
-                print("  Headers sent:")
-                for key, value in headers.items():
-                    print(f"    {key}: {value}")
-                
-                print("  Headers received:")
-                for key, value in response.headers.items():
-                    print(f"    {key}: {value}")
-                
-                print("\n")
-                
-                # Respect the delay between requests
-                if i < self.num_requests - 1:
-                    print(f"Waiting {self.delay} seconds before next request...")
-                    time.sleep(self.delay)
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"  Error: {e}\n")
+    def run_schedule(self):
+        """Start every request at its intended time on the worker pool"""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            self.schedule.start()
+            if self.sink is not None:
+                self.sink.origin_ns = self.schedule.start_ns
+            futures = []
+            for i in range(self.num_requests):
+                endpoint = self.workload.pick(i) if self.workload is not None else None
+                intended_ns = self.schedule.wait(i)
+                futures.append(executor.submit(self.execute, i, endpoint, intended_ns))
+            for future in futures:
+                future.result()
     
-    def simulate_https(self):
-        """Simulate HTTPS requests"""
-        print("Simulating HTTPS protocol...\n")
+    def execute(self, index, endpoint, intended_ns):
+        """Worker: send one request through the driver and record it"""
+        start_ns = time.perf_counter_ns()
+        error = None
+        try:
+            result = self.driver.send(endpoint, self.details)
+        except self.driver.errors as e:
+            error = type(e).__name__
+            result = DriverResult(None, False, None, None, error)
+            message = e
+        end_ns = time.perf_counter_ns()
         
-        for i in range(self.num_requests):
-            try:
-                start_time = time.time()
-                url = f"https://{self.target}:{self.port}{self.path}"
-                
-                print(f"Request {i+1}/{self.num_requests} to {url}")
-                
-                # Send the request with a random user agent
-                headers = {"User-Agent": random.choice(USER_AGENTS)}
-                response = requests.get(url, headers=headers, timeout=5, verify=False)
-                
-                elapsed = time.time() - start_time
-                self.sent_requests += 1
-                
-                # Process response
-                print(f"  Status: {response.status_code}")
-                print(f"  Time: {elapsed:.4f} seconds")
-                print(f"  Size: {len(response.content)} bytes")
-                
-                if 200 <= response.status_code < 400:
-                    self.successful_requests += 1
-                
-                # Educational output - show SSL/TLS information
-                print("  TLS Info:")
-                print(f"    Protocol: {response.raw.connection.sock.version() if hasattr(response.raw, 'connection') and hasattr(response.raw.connection, 'sock') else 'Unknown'}")
-                
-                print("  Headers sent:")
-                for key, value in headers.items():
-                    print(f"    {key}: {value}")
-                
-                print("  Headers received:")
-                for key, value in response.headers.items():
-                    print(f"    {key}: {value}")
-                
-                print("\n")
-                
-                # Respect the delay between requests
-                if i < self.num_requests - 1:
-                    print(f"Waiting {self.delay} seconds before next request...")
-                    time.sleep(self.delay)
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"  Error: {e}\n")
-    
-    def simulate_icmp(self):
-        """Simulate ICMP (ping) requests using socket"""
-        print("Simulating ICMP protocol...\n")
-        print("Note: This is a simplified ICMP simulation for educational purposes.")
-        print("For a real ICMP implementation, you would need raw socket access (requires root/admin).\n")
+        key = endpoint.name if endpoint is not None else None
+        self.recorder.record(intended_ns, start_ns, end_ns, key)
+        if self.sink is not None:
+            status = result.status if isinstance(result.status, int) else None
+            self.sink.write(intended_ns, start_ns, end_ns, status, result.size or 0, result.error, key)
         
-        for i in range(self.num_requests):
-            try:
-                start_time = time.time()
-                
-                print(f"Request {i+1}/{self.num_requests} to {self.target}")
-                
-                # Create a simple socket connection to simulate network activity
-                # This doesn't actually send ICMP packets but demonstrates the concept
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.settimeout(2)
-                
-                # Try to connect to port 7 (echo) or the specified port
-                connect_port = 7 if self.port == 0 else self.port
-                result = s.connect_ex((self.target, connect_port))
-                
-                elapsed = time.time() - start_time
-                self.sent_requests += 1
-                
-                if result == 0:
-                    status = "Port open (connection successful)"
-                    self.successful_requests += 1
+        with self._lock:
+            self.sent_requests += 1
+            self.successful_requests += result.ok
+            if key is not None:
+                counts = self.endpoint_counts[key]
+                counts[0] += 1
+                counts[1] += result.ok
+            if self.details:
+                # One block per request, so concurrent requests do not interleave
+                lines = [f"Request {index+1}/{self.num_requests} to {self.driver.describe(endpoint)}"]
+                if error is not None:
+                    lines.append(f"  Error: {message}")
                 else:
-                    status = f"Port closed or filtered (error code: {result})"
-                
-                print(f"  Status: {status}")
-                print(f"  Time: {elapsed:.4f} seconds")
-                
-                # Educational output - explain what's happening
-                print("  Note: This is simulating the concept of ICMP by checking port connectivity.")
-                print("  A real ICMP ping would use raw sockets to send ICMP echo request packets.")
-                print("  For a true ICMP implementation, use the built-in 'ping' command.")
-                
-                s.close()
-                print("\n")
-                
-                # Respect the delay between requests
-                if i < self.num_requests - 1:
-                    print(f"Waiting {self.delay} seconds before next request...")
-                    time.sleep(self.delay)
-                    
-            except socket.error as e:
-                print(f"  Error: {e}\n")
+                    lines.append(f"  Status: {result.status}")
+                    lines.append(f"  Time: {(end_ns - start_ns) / 1_000_000_000:.4f} seconds")
+                    if result.size is not None:
+                        lines.append(f"  Size: {result.size} bytes")
+                    lines += result.lines
+                lines.append("\n")
+                self.detail("\n".join(lines))
+        self.core_overhead.get().record(time.perf_counter_ns() - end_ns)
+    
+    def detail(self, text=""):
+        """Per-request output: the console in verbose mode, and the log file if one is open"""
+        if self.verbose:
+            print(text)
+        if self.log is not None:
+            self.log.write(text + "\n")
     
     def print_summary(self):
         """Print a summary of the simulation"""
@@ -223,6 +240,26 @@ class ProtocolSimulator:
         print(f"Requests sent: {self.sent_requests}")
         print(f"Successful requests: {self.successful_requests}")
         print(f"Success rate: {(self.successful_requests/self.sent_requests)*100 if self.sent_requests > 0 else 0:.2f}%")
+        for line in self.driver.summary_lines(self.sent_requests):
+            print(line)
+        print("Latency (from intended start time):")
+        for line in self.recorder.latency.merged().format_summary():
+            print(line)
+        overhead = self.core_overhead.merged()
+        print(f"Core overhead per request: p50 {overhead.percentile(50) / 1000:.1f} us, "
+              f"max {overhead.max_recorded / 1000:.1f} us")
+        if self.schedule.fell_behind:
+            for line in self.schedule.format_summary():
+                print(line)
+        if self.endpoint_counts:
+            print("Per-endpoint breakdown:")
+            print(f"  {'ENDPOINT':<30} {'REQUESTS':>9} {'SUCCESS':>8} {'P50 MS':>9} {'MAX MS':>9}")
+            for name, (count, successes) in self.endpoint_counts.items():
+                if not count:
+                    continue
+                histogram = self.recorder.latency_by_key[name].merged()
+                print(f"  {name[:30]:<30} {count:>9} {successes:>8} {histogram.percentile(50) / 1_000_000:>9.3f} "
+                      f"{histogram.max_recorded / 1_000_000:>9.3f}")
         print(f"Ended at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'='*60}\n")
         print("EDUCATIONAL NOTES:")
@@ -233,13 +270,6 @@ class ProtocolSimulator:
         print("5. Network diagnostics should always be performed with permission and care.")
         print(f"{'='*60}\n")
 
-# List of common user agents for educational demonstration
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
-    "Mozilla/5.0 (X11; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0"
-]
-
 def main():
     # Display educational disclaimer
     print("\n" + "*"*80)
@@ -257,27 +287,66 @@ def main():
     parser = argparse.ArgumentParser(description="Network Protocol Educational Simulator")
     parser.add_argument("--target", default="127.0.0.1", help="Target host (default: 127.0.0.1)")
     parser.add_argument("--port", type=int, default=80, help="Target port (default: 80)")
-    parser.add_argument("--protocol", default="http", choices=["http", "https", "icmp"], 
-                        help="Protocol to simulate (default: http)")
+    parser.add_argument("--protocol", default="http", choices=list(DRIVERS),
+                        help="Protocol to simulate; tcp times TCP connects only (default: http)")
     parser.add_argument("--requests", type=int, default=5, 
                         help=f"Number of requests to send (default: 5, max: {MAX_REQUESTS})")
     parser.add_argument("--delay", type=float, default=1.0, 
                         help=f"Delay between requests in seconds (default: 1.0, min: {MIN_DELAY})")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help=f"Requests allowed in flight at once (default: 1, max: {MAX_CONCURRENCY})")
+    parser.add_argument("--results-out", metavar="FILE",
+                        help="Stream one JSON record per request to FILE (JSONL)")
     parser.add_argument("--path", default="/", help="Path for HTTP/HTTPS requests (default: /)")
+    parser.add_argument("--connection", default="reuse", choices=CONNECTION_MODES,
+                        help="Reuse a keep-alive session or open a new connection per request (default: reuse)")
+    parser.add_argument("--phases", action="store_true",
+                        help="Time DNS, connect, TLS, TTFB and body separately on a new connection per request")
+    parser.add_argument("--tls-resume", action="store_true",
+                        help="HTTPS: new connection per request, resuming the cached TLS session; "
+                             "reports full vs resumed handshake cost")
+    parser.add_argument("--verify-body", action="store_true",
+                        help="Check every HTTP/HTTPS response body against its Content-Length and Content-Digest")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Do not print per-request details; only the summary is shown")
+    parser.add_argument("--progress", action="store_true",
+                        help="Like --quiet, plus a live line with rolling RPS, in-flight count, errors and p99")
+    parser.add_argument("--log", metavar="FILE",
+                        help="Write the per-request details to FILE through a buffer instead of the console")
+    parser.add_argument("--scenario",
+                        help="JSONL workload of weighted endpoints or a trace to replay; paths are relative to --path")
     
     args = parser.parse_args()
     
     # Create and run the simulator
+    log = open_request_log(args.log)
+    sink = ResultSink(args.results_out) if args.results_out else None
     simulator = ProtocolSimulator(
         target=args.target,
         port=args.port,
         protocol=args.protocol,
         num_requests=args.requests,
         delay=args.delay,
-        path=args.path
+        path=args.path,
+        connection=args.connection,
+        phases=args.phases,
+        scenario=args.scenario,
+        verbose=not args.quiet,
+        progress=args.progress,
+        log=log,
+        concurrency=args.concurrency,
+        sink=sink,
+        tls_resume=args.tls_resume,
+        verify_body=args.verify_body
     )
     
-    simulator.run_simulation()
+    try:
+        simulator.run_simulation()
+    finally:
+        if sink is not None:
+            sink.close()
+        if log is not None:
+            log.close()
 
 if __name__ == "__main__":
     try:
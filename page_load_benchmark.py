@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Page Load Benchmark - FOR EDUCATIONAL PURPOSES ONLY
+
+Loads a whole page the way a browser does, instead of timing one URL: the
+HTML document is fetched, its same-origin subresources (stylesheets,
+scripts, fonts, images, ...) are parsed out and fetched in parallel over a
+small pool of keep-alive connections, and stylesheets are parsed in turn for
+the fonts and images they reference. The report shows:
+
+- total page-load time: navigation start -> last subresource complete
+- a waterfall of every request (queued, started, finished)
+- the critical path: the dependency chain that ended last, e.g.
+  page.html -> style.css -> font.woff2
+- what was skipped: cross-origin subresources are never fetched, and
+  redirects are not followed
+
+Every run loads the page twice. The cold pass starts with an empty cache;
+the warm pass revalidates everything it cached with If-None-Match and
+If-Modified-Since, so 304 responses replace the bodies and the difference
+between the passes is what HTTP caching saves on the serving stack. Both
+passes open their own connections, so connection setup is paid equally.
+
+Only whitelisted hosts are loaded, and page loads are paced at least
+MIN_DELAY apart. Serve a page and its assets with the local target server:
+
+    python local_target_server.py --port 8080 --root site/ --quiet
+    python page_load_benchmark.py --url http://localhost:8080/ --runs 3
+"""
+
+import argparse
+import concurrent.futures
+import re
+import sys
+import time
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import requests
+import urllib3
+
+from body_reader import drain_response
+from connection_pool import SessionProvider
+from controlled_load_tester import MAX_THREADS, WHITELIST
+from latency_histogram import LatencyHistogram
+
+# SAFETY FEATURES
+MAX_RUNS = 5             # Maximum number of cold + warm page-load pairs
+MAX_SUBRESOURCES = 50    # Maximum number of subresources fetched per page load
+MIN_DELAY = 1.0          # Minimum delay between page loads in seconds
+
+DEFAULT_WORKERS = 6  # Parallel connections per host, as in common browsers
+
+# Bodies that are parsed for further subresources (and so kept in the cache)
+PARSED_TYPES = {"html", "css"}
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)|@import\s+(['"])([^'"]+)\3""", re.IGNORECASE)
+
+_LINK_KINDS = {"stylesheet": "css", "icon": "icon", "preload": "preload", "modulepreload": "script",
+               "manifest": "manifest", "apple-touch-icon": "icon"}
+
+
+def is_allowed_target(url):
+    """Whether url points at a whitelisted host
+
+    Compares the parsed hostname, i.e. the host actually connected to, so
+    userinfo such as http://localhost:80@example.com/ cannot slip through.
+    """
+    return urlsplit(url).hostname in WHITELIST
+
+
+def css_references(text):
+    """URLs referenced by url(...) and @import in a stylesheet"""
+    references = []
+    for match in _CSS_URL.finditer(text):
+        url = (match.group(2) or match.group(4)).strip()
+        if url and not url.startswith("data:"):
+            references.append(url)
+    return references
+
+
+class SubresourceParser(HTMLParser):
+    """Collects the (kind, url) pairs of the subresources an HTML page uses"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.references = []
+        self._in_style = False
+
+    def _add(self, kind, url):
+        if url and not url.startswith(("data:", "javascript:", "#")):
+            self.references.append((kind, url.strip()))
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "link":
+            rels = (attrs.get("rel") or "").lower().split()
+            kind = next((_LINK_KINDS[rel] for rel in rels if rel in _LINK_KINDS), None)
+            if kind is not None:
+                self._add(kind, attrs.get("href"))
+        elif tag == "script":
+            self._add("script", attrs.get("src"))
+        elif tag in ("img", "source", "video", "audio", "input", "iframe", "embed", "track"):
+            kind = "image" if tag in ("img", "source", "input") else tag
+            self._add(kind, attrs.get("src"))
+            for candidate in (attrs.get("srcset") or "").split(","):
+                self._add(kind, candidate.strip().split(" ")[0])
+            if tag == "video":
+                self._add("image", attrs.get("poster"))
+        elif tag == "style":
+            self._in_style = True
+        if attrs.get("style"):
+            for url in css_references(attrs["style"]):
+                self._add("image", url)
+
+    def handle_endtag(self, tag):
+        if tag == "style":
+            self._in_style = False
+
+    def handle_data(self, data):
+        if self._in_style:
+            for url in css_references(data):
+                self._add("css-ref", url)
+
+
+class CacheEntry:
+    """Validators of a cached response, and its body if it is parsed"""
+
+    def __init__(self, etag, last_modified, body, size):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+        self.size = size
+
+
+class HTTPCache:
+    """Minimal private cache that always revalidates (like Cache-Control: no-cache)"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def conditional_headers(self, url):
+        entry = self.entries.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url, response, body, size):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.entries[url] = CacheEntry(etag, last_modified, body, size)
+
+
+class Resource:
+    """One request of a page load; times are nanoseconds since navigation start"""
+
+    def __init__(self, url, kind, parent, discovered_ns):
+        self.url = url
+        self.kind = kind
+        self.parent = parent
+        self.discovered_ns = discovered_ns
+        self.start_ns = self.end_ns = None
+        self.status = None
+        self.size = 0
+        self.revalidated = False
+        self.error = None
+        self.body = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.status is not None and self.status < 400
+
+
+class PageLoad:
+    """Result of loading one page: every resource and the overall timing"""
+
+    def __init__(self, resources, skipped, duration_ns, connections_opened):
+        self.resources = resources
+        self.skipped = skipped
+        self.duration_ns = duration_ns
+        self.connections_opened = connections_opened
+
+    @property
+    def bytes_received(self):
+        return sum(resource.size for resource in self.resources)
+
+    @property
+    def revalidated(self):
+        return sum(1 for resource in self.resources if resource.revalidated)
+
+    @property
+    def errors(self):
+        return sum(1 for resource in self.resources if not resource.ok)
+
+    def critical_path(self):
+        """The dependency chain ending at the resource that finished last"""
+        finished = [resource for resource in self.resources if resource.end_ns is not None]
+        if not finished:
+            return []
+        chain = [max(finished, key=lambda resource: resource.end_ns)]
+        while chain[-1].parent is not None:
+            chain.append(chain[-1].parent)
+        return chain[::-1]
+
+
+class PageLoader:
+    """Loads a page and its same-origin subresources over pooled connections"""
+
+    def __init__(self, url, workers=DEFAULT_WORKERS, timeout=5.0, cache=None):
+        self.url = urldefrag(url)[0]
+        self.origin = self._origin(self.url)
+        self.workers = max(1, min(workers, MAX_THREADS))
+        self.timeout = timeout
+        self.cache = cache
+
+    @staticmethod
+    def _origin(url):
+        parts = urlsplit(url)
+        return parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80)
+
+    def _fetch(self, sessions, resource, start_origin_ns):
+        session = sessions.acquire()
+        resource.start_ns = time.perf_counter_ns() - start_origin_ns
+        try:
+            headers = self.cache.conditional_headers(resource.url) if self.cache is not None else {}
+            # Redirects are not followed: they could leave the whitelisted origin
+            response = session.get(resource.url, headers=headers, timeout=self.timeout, stream=True,
+                                   allow_redirects=False)
+            resource.status = response.status_code
+            if response.status_code == 304 and self.cache is not None and resource.url in self.cache.entries:
+                drain_response(response)  # No body; returns the connection to the pool
+                resource.revalidated = True
+                resource.body = self.cache.entries[resource.url].body
+            elif resource.kind in PARSED_TYPES:
+                # Only documents that have to be parsed are kept in memory
+                resource.body = response.content
+                resource.size = len(resource.body)
+            else:
+                resource.size = drain_response(response)
+            if response.status_code == 200 and self.cache is not None:
+                self.cache.store(resource.url, response, resource.body, resource.size)
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+            resource.error = type(e).__name__
+        finally:
+            resource.end_ns = time.perf_counter_ns() - start_origin_ns
+            sessions.release(session)
+        return resource
+
+    def _references(self, resource):
+        """Subresources referenced by a fetched HTML page or stylesheet"""
+        if resource.body is None or not resource.ok:
+            return []
+        text = resource.body.decode("utf-8", errors="replace")
+        if resource.kind == "html":
+            parser = SubresourceParser()
+            parser.feed(text)
+            references = parser.references
+        else:
+            references = [("css-ref", url) for url in css_references(text)]
+        # A stylesheet referenced from a stylesheet (@import) is parsed too
+        return [(kind, urljoin(resource.url, url)) for kind, url in references]
+
+    def load(self):
+        """Load the page once and return a PageLoad"""
+        sessions = SessionProvider("reuse", pool_size=self.workers)
+        resources = []
+        skipped = []
+        seen = {self.url}
+        start_origin_ns = time.perf_counter_ns()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            page = Resource(self.url, "html", None, 0)
+            resources.append(page)
+            pending = {executor.submit(self._fetch, sessions, page, start_origin_ns)}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    parent = future.result()
+                    for kind, url in self._references(parent):
+                        url = urldefrag(url)[0]
+                        if url in seen:
+                            continue
+                        seen.add(url)
+                        if self._origin(url) != self.origin:
+                            skipped.append(url)
+                            continue
+                        if len(resources) - 1 >= MAX_SUBRESOURCES:
+                            skipped.append(url)
+                            continue
+                        if kind == "css-ref" and urlsplit(url).path.lower().endswith(".css"):
+                            kind = "css"
+                        elif kind == "css-ref":
+                            kind = "font" if re.search(r"\.(woff2?|ttf|otf|eot)$", urlsplit(url).path, re.I) else "image"
+                        resource = Resource(url, kind, parent, time.perf_counter_ns() - start_origin_ns)
+                        resources.append(resource)
+                        pending.add(executor.submit(self._fetch, sessions, resource, start_origin_ns))
+        duration_ns = max(resource.end_ns for resource in resources)
+        sessions.close()
+        return PageLoad(resources, skipped, duration_ns, sessions.connections_opened)
+
+
+def _ms(value_ns):
+    return value_ns / 1_000_000
+
+
+def _short(url, base, width=40):
+    parts = urlsplit(url)
+    name = parts.path + (f"?{parts.query}" if parts.query else "") if base else url
+    return name if len(name) <= width else "..." + name[-(width - 3):]
+
+
+def print_waterfall(load):
+    print(f"  {'RESOURCE':<40} {'KIND':<7} {'STATUS':>6} {'BYTES':>9} {'QUEUED':>8} {'START':>8} {'END':>8}")
+    for resource in sorted(load.resources, key=lambda resource: resource.start_ns or 0):
+        status = resource.error or resource.status
+        print(f"  {_short(resource.url, True):<40} {resource.kind:<7} {status!s:>6} {resource.size:>9} "
+              f"{_ms(resource.discovered_ns):>8.2f} {_ms(resource.start_ns):>8.2f} {_ms(resource.end_ns):>8.2f}")
+
+
+def print_critical_path(load):
+    chain = load.critical_path()
+    print("Critical path (ms since navigation start):")
+    for depth, resource in enumerate(chain):
+        wait_ms = _ms(resource.start_ns - resource.discovered_ns)
+        print(f"  {'  ' * depth}{_short(resource.url, True)}: queued {wait_ms:.2f}, "
+              f"fetch {_ms(resource.end_ns - resource.start_ns):.2f}, done at {_ms(resource.end_ns):.2f}")
+
+
+def summarize(name, loads, histogram):
+    load = loads[-1]
+    return (f"  {name:<6} {histogram.percentile(50) / 1e6:>9.2f} {histogram.max_recorded / 1e6:>9.2f} "
+            f"{len(load.resources):>9} {load.revalidated:>6} {load.bytes_received:>10} {load.connections_opened:>6} "
+            f"{load.errors:>6}")
+
+
+def run_benchmark(url, runs=1, workers=DEFAULT_WORKERS, timeout=5.0, delay=MIN_DELAY):
+    """Load the page cold and then warm, runs times; return the two lists of PageLoads"""
+    if not is_allowed_target(url):
+        raise ValueError(f"Target {url} is not in the whitelist: {', '.join(WHITELIST)}")
+    runs = max(1, min(runs, MAX_RUNS))
+    delay = max(delay, MIN_DELAY)
+    cold, warm = [], []
+    for run in range(runs):
+        cache = HTTPCache()
+        for passes in (cold, warm):
+            if cold:
+                time.sleep(delay)
+            passes.append(PageLoader(url, workers, timeout, cache).load())
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Page Load Benchmark - FOR EDUCATIONAL PURPOSES ONLY",
+        epilog="WARNING: Only use against servers you own or have explicit permission to test."
+    )
+    parser.add_argument("--url", required=True, help="URL of the HTML page (must be a whitelisted local server)")
+    parser.add_argument("--runs", type=int, default=1, help=f"Cold + warm page-load pairs (default: 1, max: {MAX_RUNS})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Parallel connections for subresources (default: {DEFAULT_WORKERS}, max: {MAX_THREADS})")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Request timeout in seconds (default: 5.0)")
+    parser.add_argument("--delay", type=float, default=MIN_DELAY,
+                        help=f"Pause between page loads in seconds (default: {MIN_DELAY}, min: {MIN_DELAY})")
+    args = parser.parse_args()
+
+    if not is_allowed_target(args.url):
+        print(f"\033[91mERROR: Target {args.url} is not in the whitelist.\033[0m")
+        print(f"For educational purposes, this script only allows connections to: {', '.join(WHITELIST)}")
+        sys.exit(1)
+
+    runs = max(1, min(args.runs, MAX_RUNS))
+    print(f"\n{'='*60}")
+    print("PAGE LOAD BENCHMARK - EDUCATIONAL USE ONLY")
+    print(f"{'='*60}")
+    print(f"Page: {args.url}")
+    print(f"Runs: {runs} (cold + warm-cache page load each)")
+    print(f"Parallel connections: {max(1, min(args.workers, MAX_THREADS))}")
+    print(f"{'='*60}\n")
+
+    cold, warm = run_benchmark(args.url, runs, args.workers, args.timeout, args.delay)
+
+    for name, load in (("Cold", cold[-1]), ("Warm", warm[-1])):
+        print(f"{name} page load, last run: {_ms(load.duration_ns):.2f} ms")
+        print_waterfall(load)
+        print_critical_path(load)
+        print()
+
+    skipped = cold[-1].skipped
+    if skipped:
+        print(f"Skipped {len(skipped)} subresources (cross-origin, or over the cap of {MAX_SUBRESOURCES}), e.g.:")
+        for url in skipped[:5]:
+            print(f"  {_short(url, False, 70)}")
+        print()
+
+    histograms = {}
+    for name, loads in (("cold", cold), ("warm", warm)):
+        histograms[name] = LatencyHistogram()
+        for load in loads:
+            histograms[name].record(load.duration_ns)
+
+    print("=" * 60)
+    print("PAGE LOAD SUMMARY")
+    print("=" * 60)
+    print(f"  {'PASS':<6} {'P50 MS':>9} {'MAX MS':>9} {'REQUESTS':>9} {'304S':>6} {'BYTES':>10} {'CONNS':>6} {'ERRORS':>6}")
+    print(summarize("cold", cold, histograms["cold"]))
+    print(summarize("warm", warm, histograms["warm"]))
+    saved_ms = (histograms["cold"].percentile(50) - histograms["warm"].percentile(50)) / 1e6
+    saved_bytes = cold[-1].bytes_received - warm[-1].bytes_received
+    print(f"Revalidation saves {saved_ms:.2f} ms per page load at p50 and {saved_bytes} bytes per page")
+    page = cold[-1].resources[0]
+    if not page.ok:
+        print(f"\033[91mERROR: The page itself could not be loaded ({page.error or page.status}).\033[0m")
+    elif not warm[-1].revalidated:
+        print("Note: no response was revalidated; the server sent no ETag or Last-Modified validators")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nBenchmark interrupted by user.")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Progress Reporter - FOR EDUCATIONAL PURPOSES ONLY
+
+A single, rolling console line for quiet runs, e.g.
+
+    [  12s] 120/500 done | 10.0 req/s | in flight 3 | errors 0 | p99 (5s) 12.345 ms
+
+Printing several lines per request from the threads that measure latency
+costs more than a fast local request takes, so in quiet and progress mode
+nothing is printed per request. A background thread redraws this line about
+once a second instead, from counters the run keeps anyway:
+
+- RPS and p99 over a sliding window of recent completions
+- in flight: requests dispatched but not completed yet
+- errors: failed requests so far
+"""
+
+import sys
+import threading
+import time
+
+from latency_histogram import SlidingWindowHistogram
+
+PROGRESS_INTERVAL = 1.0
+PROGRESS_WINDOW_SECONDS = 5.0
+
+# Per-request detail in quiet mode goes to an optional log file through a
+# large buffer, so writing it costs a memory copy rather than a system call
+LOG_BUFFER_SIZE = 1 << 16
+
+
+def open_request_log(path):
+    """Open a buffered per-request log file (None if no path is given)"""
+    return open(path, "w", buffering=LOG_BUFFER_SIZE) if path else None
+
+
+class ProgressReporter:
+    """Background thread redrawing one progress line
+
+    counters() must return (dispatched, errors); completed requests and their
+    latencies are recorded into self.window.
+    """
+
+    def __init__(self, total_requests, counters, interval=PROGRESS_INTERVAL,
+                 window_seconds=PROGRESS_WINDOW_SECONDS, stream=None):
+        self.total_requests = total_requests
+        self.counters = counters
+        self.interval = interval
+        self.window = SlidingWindowHistogram(window_seconds)
+        self.stream = stream or sys.stdout
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._start_ns = None
+
+    def start(self):
+        self._start_ns = time.perf_counter_ns()
+        self._thread.start()
+        return self
+
+    def format_line(self):
+        elapsed_ns = time.perf_counter_ns() - self._start_ns
+        dispatched, errors = self.counters()
+        completed = self.window.total_count
+        recent = self.window.snapshot()
+        # Early in the run the window is not full yet
+        span = min(elapsed_ns, self.window.window_ns) / 1_000_000_000
+        rps = recent.total_count / span if span > 0 else 0.0
+        p99 = recent.percentile(99) / 1_000_000 if recent.total_count else 0.0
+        return (f"[{elapsed_ns / 1_000_000_000:>5.0f}s] {completed}/{self.total_requests} done | "
+                f"{rps:.1f} req/s | in flight {max(dispatched - completed, 0)} | errors {errors} | "
+                f"p99 ({self.window.window_ns / 1_000_000_000:g}s) {p99:.3f} ms")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.stream.write("\r" + self.format_line() + "\033[K")
+            self.stream.flush()
+
+    def stop(self):
+        """Stop redrawing and leave the final line on screen"""
+        self._stop.set()
+        self._thread.join()
+        self.stream.write("\r" + self.format_line() + "\033[K\n")
+        self.stream.flush()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Protocol Drivers - FOR EDUCATIONAL PURPOSES ONLY
+
+Small objects that know how to send one request of one protocol. The
+simulator core in network_protocol_simulator.py owns everything else
+(scheduling, concurrency, timing, histograms, counting, output and result
+streaming), so an improvement to the core benefits every protocol at once.
+
+Every driver has the same interface:
+
+- describe(endpoint): what is about to be sent, for the per-request output
+- send(endpoint, details): send one request and return a DriverResult; the
+  detail lines (headers, TLS, phases) are only built when details is true
+- summary_lines(sent): protocol-specific lines for the run summary
+- close(): release pooled connections
+- errors: exception types that count as a failed request
+
+endpoint is a workload Endpoint in scenario runs and None otherwise.
+"""
+
+import errno
+import http.client
+import random
+import selectors
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import requests
+import urllib3
+
+from body_reader import BodyVerificationError, drain_response
+from connection_pool import SessionProvider
+from http_probe import PHASES, timed_http_request, unverified_tls_context
+from latency_histogram import PerThreadHistograms
+
+# status: protocol status (HTTP code, or a description); ok: counts as a
+# success; size: bytes received, or None if not applicable; lines: detail
+# lines; error: failure name for the results file when there is no exception
+DriverResult = namedtuple("DriverResult", ["status", "ok", "size", "lines", "error"], defaults=(None,))
+
+# List of common user agents for educational demonstration
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0"
+]
+
+
+class HTTPDriver:
+    """GET requests (or scenario requests) through a pooled requests session"""
+
+    scheme = "http"
+    verify = True
+    errors = (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, OSError,
+              http.client.HTTPException, BodyVerificationError)
+
+    def __init__(self, target, port, path="/", connection="reuse", phases=False, pool_size=1, timeout=5,
+                 verify_body=False):
+        self.target = target
+        self.port = port
+        self.path = path
+        self.url = f"{self.scheme}://{target}:{port}{path}"
+        self.connection = connection
+        self.phases = phases
+        self.timeout = timeout
+        self.verify_body = verify_body
+        self.sessions = SessionProvider(connection, pool_size=pool_size)
+        self.phase_histograms = {phase: PerThreadHistograms() for phase in self.reported_phases()}
+        self.tls_context = None
+
+    def reported_phases(self):
+        """Phases that apply to this protocol"""
+        return [phase for phase in PHASES if phase != "tls"]
+
+    def describe(self, endpoint):
+        return self.url if endpoint is None else f"{endpoint.method} {endpoint.url}"
+
+    def send(self, endpoint, details):
+        if self.phases:
+            return self._send_timed(details)
+        session = self.sessions.acquire()
+        try:
+            if endpoint is not None:
+                headers = endpoint.prepared.headers
+                response = session.send(endpoint.prepared, timeout=self.timeout, verify=self.verify, stream=True)
+            else:
+                # A random user agent for educational demonstration
+                headers = {"User-Agent": random.choice(USER_AGENTS)}
+                response = session.get(self.url, headers=headers, timeout=self.timeout, verify=self.verify,
+                                       stream=True)
+            # The TLS details are only readable while the connection is checked out
+            lines = self.tls_lines(response=response) if details else None
+            size = drain_response(response, self.verify_body)
+        finally:
+            self.sessions.release(session)
+        status = response.status_code
+        if details:
+            lines += self.header_lines(headers, response.headers.items())
+        return DriverResult(status, 200 <= status < 400, size, lines)
+
+    def _send_timed(self, details):
+        """Send through the phase-timed probe on a new connection"""
+        headers = {"User-Agent": random.choice(USER_AGENTS)}
+        result = timed_http_request(self.target, self.port, self.path, headers, tls_context=self.tls_context,
+                                    timeout=self.timeout, verify_body=self.verify_body)
+        for phase, histograms in self.phase_histograms.items():
+            histograms.get().record(getattr(result.timings, phase))
+        lines = None
+        if details:
+            lines = ["  Phases:"]
+            for phase in self.phase_histograms:
+                lines.append(f"    {phase.upper():<8} {getattr(result.timings, phase) / 1_000_000:.3f} ms")
+            lines += self.tls_lines(probe=result)
+            lines += self.header_lines(headers, result.headers)
+        return DriverResult(result.status, 200 <= result.status < 400, result.size, lines)
+
+    def tls_lines(self, response=None, probe=None):
+        return []
+
+    @staticmethod
+    def header_lines(sent, received):
+        # Educational output - show headers
+        lines = ["  Headers sent:"]
+        lines += [f"    {key}: {value}" for key, value in sent.items()]
+        lines.append("  Headers received:")
+        lines += [f"    {key}: {value}" for key, value in received]
+        return lines
+
+    def summary_lines(self, sent):
+        if self.phases:
+            lines = [f"Connections opened: {sent} for {sent} requests (new connection per request)"]
+            lines.append("Phase breakdown (ms):")
+            lines.append(f"  {'PHASE':<8} {'MEAN':>9} {'P50':>9} {'P90':>9} {'P99':>9} {'MAX':>9}")
+            for phase, histograms in self.phase_histograms.items():
+                histogram = histograms.merged()
+                values = [histogram.mean(), histogram.percentile(50), histogram.percentile(90),
+                          histogram.percentile(99), histogram.max_recorded]
+                lines.append(f"  {phase.upper():<8} " + " ".join(f"{value / 1_000_000:>9.3f}" for value in values))
+            return lines
+        return [f"Connections opened: {self.sessions.connections_opened} for {sent} requests ({self.connection} mode)"]
+
+    def close(self):
+        self.sessions.close()
+
+
+class HTTPSDriver(HTTPDriver):
+    """HTTPS requests without certificate verification (self-signed lab servers)
+
+    With resume, every request opens a new connection through the phase-timed
+    probe and offers the most recent TLS session, so the handshake cost with
+    and without the server's session cache can be compared. Handshake times,
+    versions, ciphers and ALPN are aggregated for the summary.
+    """
+
+    scheme = "https"
+    verify = False
+
+    def __init__(self, *args, resume=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Built once: loading the default CA store costs tens of milliseconds
+        self.tls_context = unverified_tls_context()
+        self.resume = resume
+        if resume:
+            self.phases = True
+        self.tls_session = None
+        self.handshakes = {"full": PerThreadHistograms(), "resumed": PerThreadHistograms()}
+        self.negotiated = {}  # (version, cipher, alpn) -> count
+        self._lock = threading.Lock()
+
+    def reported_phases(self):
+        return list(PHASES)
+
+    def _send_timed(self, details):
+        if not self.resume:
+            return super()._send_timed(details)
+        headers = {"User-Agent": random.choice(USER_AGENTS)}
+        probe = timed_http_request(self.target, self.port, self.path, headers, tls_context=self.tls_context,
+                                   timeout=self.timeout, tls_session=self.tls_session,
+                                   verify_body=self.verify_body)
+        # Offer the newest session next time; TLS 1.3 tickets may be single use
+        if probe.tls_session is not None:
+            self.tls_session = probe.tls_session
+        for phase, histograms in self.phase_histograms.items():
+            histograms.get().record(getattr(probe.timings, phase))
+        self.handshakes["resumed" if probe.session_reused else "full"].get().record(probe.timings.tls)
+        key = (probe.tls_version, probe.cipher, probe.alpn)
+        with self._lock:
+            self.negotiated[key] = self.negotiated.get(key, 0) + 1
+        lines = None
+        if details:
+            lines = [f"  TLS handshake: {'resumed' if probe.session_reused else 'full'} "
+                     f"in {probe.timings.tls / 1_000_000:.3f} ms"]
+            lines += self.header_lines(headers, probe.headers)
+        return DriverResult(probe.status, 200 <= probe.status < 400, probe.size, lines)
+
+    def summary_lines(self, sent):
+        lines = super().summary_lines(sent)
+        if not self.resume:
+            return lines
+        full = self.handshakes["full"].merged()
+        resumed = self.handshakes["resumed"].merged()
+        total = full.total_count + resumed.total_count
+        lines.append(f"TLS session resumption: {resumed.total_count}/{total} handshakes resumed "
+                     f"({resumed.total_count / total * 100 if total else 0:.1f}%)")
+        lines.append("TLS handshake time (ms):")
+        lines.append(f"  {'HANDSHAKE':<10} {'COUNT':>6} {'MEAN':>9} {'P50':>9} {'P90':>9} {'MAX':>9}")
+        for name, histogram in (("full", full), ("resumed", resumed)):
+            if not histogram.total_count:
+                continue
+            values = [histogram.mean(), histogram.percentile(50), histogram.percentile(90), histogram.max_recorded]
+            lines.append(f"  {name:<10} {histogram.total_count:>6} " +
+                         " ".join(f"{value / 1_000_000:>9.3f}" for value in values))
+        if full.total_count and resumed.total_count:
+            saved = (full.percentile(50) - resumed.percentile(50)) / 1_000_000
+            lines.append(f"  Resumption saves {saved:.3f} ms per handshake at p50")
+        lines.append("Negotiated parameters:")
+        for (version, cipher, alpn), count in sorted(self.negotiated.items(), key=lambda item: -item[1]):
+            lines.append(f"  {version} {cipher} (ALPN: {alpn or 'none'}): {count}")
+        return lines
+
+    def tls_lines(self, response=None, probe=None):
+        # Educational output - show SSL/TLS information
+        if probe is not None:
+            return ["  TLS Info:", f"    Protocol: {probe.tls_version}", f"    Cipher: {probe.cipher}"]
+        connection = getattr(response.raw, "connection", None)
+        sock = getattr(connection, "sock", None)
+        return ["  TLS Info:", f"    Protocol: {sock.version() if sock is not None else 'Unknown'}"]
+
+
+class TCPConnectDriver:
+    """TCP connect-latency probe built on a non-blocking socket
+
+    The address is resolved once up front, so DNS never shows up in the
+    timings. Each probe starts a non-blocking connect, waits for the socket
+    to become writable with a selector and reads SO_ERROR; the time from
+    connect() to the established connection is taken with perf_counter_ns.
+    That is the network round trip plus any accept-queue (SYN backlog) delay
+    on the server, with no application latency in it. Connect times go to a
+    histogram, and timeouts and failed connects are counted separately.
+    """
+
+    scheme = "tcp"
+    errors = (OSError,)
+
+    def __init__(self, target, port, timeout=2, **_):
+        self.target = target
+        self.port = port
+        self.timeout = timeout
+        self._address_info = socket.getaddrinfo(target, port, type=socket.SOCK_STREAM)[0]
+        self.connect_times = PerThreadHistograms()
+        self.timeouts = 0
+        self.failures = {}  # errno name -> count
+        self._lock = threading.Lock()
+
+    def describe(self, endpoint):
+        return f"{self.target}:{self.port}"
+
+    def connect_once(self):
+        """Return (errno, or None on timeout; nanoseconds until the connect finished)"""
+        family, socktype, proto, _, address = self._address_info
+        sock = socket.socket(family, socktype, proto)
+        try:
+            sock.setblocking(False)
+            with selectors.DefaultSelector() as selector:
+                start_ns = time.perf_counter_ns()
+                result = sock.connect_ex(address)
+                if result in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                    selector.register(sock, selectors.EVENT_WRITE)
+                    if not selector.select(self.timeout):
+                        return None, time.perf_counter_ns() - start_ns
+                    result = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                return result, time.perf_counter_ns() - start_ns
+        finally:
+            sock.close()
+
+    def send(self, endpoint, details):
+        result, elapsed_ns = self.connect_once()
+        lines = self.note_lines() if details else None
+        if result == 0:
+            self.connect_times.get().record(elapsed_ns)
+            return DriverResult(f"Port open (connected in {elapsed_ns / 1_000_000:.3f} ms)", True, None, lines)
+        if result is None:
+            with self._lock:
+                self.timeouts += 1
+            return DriverResult(f"No answer within {self.timeout} seconds (filtered, or the backlog is full)",
+                                False, None, lines, "timeout")
+        name = errno.errorcode.get(result, str(result))
+        with self._lock:
+            self.failures[name] = self.failures.get(name, 0) + 1
+        return DriverResult(f"Port closed or unreachable ({name})", False, None, lines, name)
+
+    def note_lines(self):
+        return []
+
+    def summary_lines(self, sent):
+        histogram = self.connect_times.merged()
+        lines = [f"Connections attempted: {sent}"]
+        lines.append(f"Connect time (connect() -> established, {histogram.total_count} connected):")
+        if histogram.total_count:
+            lines += histogram.format_summary()
+        else:
+            lines.append("  No connection was established")
+        lines.append(f"Timeouts: {self.timeouts} (no answer within {self.timeout} seconds)")
+        if self.failures:
+            lines.append("Failed connects: " + ", ".join(f"{name} x{count}" for name, count in sorted(self.failures.items())))
+        return lines
+
+    def close(self):
+        pass
+
+
+class ICMPSimulationDriver(TCPConnectDriver):
+    """Simplified ICMP simulation: a timed TCP connect stands in for an echo request"""
+
+    scheme = "icmp"
+
+    def __init__(self, target, port, timeout=2, **_):
+        # Try to connect to port 7 (echo) or the specified port
+        super().__init__(target, 7 if port == 0 else port, timeout)
+
+    def note_lines(self):
+        # Educational output - explain what's happening
+        return [
+            "  Note: This is simulating the concept of ICMP by timing a TCP connect (handshake round trip).",
+            "  A real ICMP ping would use raw sockets to send ICMP echo request packets.",
+            "  For a true ICMP implementation, use the built-in 'ping' command.",
+        ]
+
+
+DRIVERS = {
+    "http": HTTPDriver,
+    "https": HTTPSDriver,
+    "tcp": TCPConnectDriver,
+    "icmp": ICMPSimulationDriver,
+}
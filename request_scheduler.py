@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Request Scheduler - FOR EDUCATIONAL PURPOSES ONLY
+
+An open-model, fixed-rate scheduler that avoids coordinated omission.
+
+Every request is given an intended start time on the monotonic clock before
+the run begins (start + index * interval). Latency is measured from that
+intended time, not from when a worker finally picked the request up, so time
+spent queueing behind saturated workers is included in the reported numbers.
+Each request's latency is split into:
+
+- queue delay: intended start -> actual start (waiting for a free worker)
+- service time: actual start -> response complete
+
+The scheduler also records how late it dispatched each request. If the client
+itself falls behind schedule (for example because it is CPU bound), the run is
+flagged, since the offered load was then lower than requested.
+"""
+
+import asyncio
+import time
+
+from latency_histogram import LatencyHistogram, PerThreadHistograms
+
+# Dispatches later than this are counted as the client falling behind
+SCHEDULE_LAG_TOLERANCE_NS = 5_000_000
+
+
+class FixedRateSchedule:
+    """Intended start times at a fixed interval on the perf_counter clock"""
+
+    def __init__(self, interval, tolerance_ns=SCHEDULE_LAG_TOLERANCE_NS):
+        self.interval_ns = int(interval * 1_000_000_000)
+        self.tolerance_ns = tolerance_ns
+        self.start_ns = None
+        self.dispatch_lag = LatencyHistogram()
+        self.late_dispatches = 0
+
+    def start(self):
+        """Fix time zero of the schedule"""
+        self.start_ns = time.perf_counter_ns()
+        return self.start_ns
+
+    def offset(self, index):
+        """Return the intended start of request number index relative to time zero"""
+        return index * self.interval_ns
+
+    def intended(self, index):
+        """Return the intended start time of request number index"""
+        return self.start_ns + self.offset(index)
+
+    def _record_dispatch(self, intended_ns):
+        lag_ns = time.perf_counter_ns() - intended_ns
+        self.dispatch_lag.record(lag_ns)
+        if lag_ns > self.tolerance_ns:
+            self.late_dispatches += 1
+
+    def wait(self, index):
+        """Sleep until request index is due and return its intended start time"""
+        intended_ns = self.intended(index)
+        remaining_ns = intended_ns - time.perf_counter_ns()
+        if remaining_ns > 0:
+            time.sleep(remaining_ns / 1_000_000_000)
+        self._record_dispatch(intended_ns)
+        return intended_ns
+
+    async def wait_async(self, index):
+        """Asyncio version of wait()"""
+        intended_ns = self.intended(index)
+        remaining_ns = intended_ns - time.perf_counter_ns()
+        if remaining_ns > 0:
+            await asyncio.sleep(remaining_ns / 1_000_000_000)
+        self._record_dispatch(intended_ns)
+        return intended_ns
+
+    @property
+    def fell_behind(self):
+        return self.late_dispatches > 0
+
+    def format_summary(self, indent="  "):
+        """Return summary lines describing schedule adherence"""
+        lines = [
+            f"{indent}Dispatch lag p99: {self.dispatch_lag.percentile(99) / 1_000_000:.3f} ms",
+            f"{indent}Dispatch lag max: {self.dispatch_lag.max_recorded / 1_000_000:.3f} ms",
+            f"{indent}Late dispatches (> {self.tolerance_ns / 1_000_000:g} ms): "
+            f"{self.late_dispatches}/{self.dispatch_lag.total_count}",
+        ]
+        if self.fell_behind:
+            lines.append(f"{indent}WARNING: the client fell behind schedule; the offered load was lower than requested")
+        return lines
+
+
+class ReplaySchedule(FixedRateSchedule):
+    """Intended start times taken from a recorded trace
+
+    Gaps shorter than min_interval are stretched to min_interval, so a replay
+    can never exceed the rate limit of the tool replaying it.
+    """
+
+    def __init__(self, offsets, min_interval=0.0, tolerance_ns=SCHEDULE_LAG_TOLERANCE_NS):
+        super().__init__(min_interval, tolerance_ns)
+        self.offsets_ns = []
+        previous = None
+        for offset in offsets:
+            offset_ns = int(offset * 1_000_000_000)
+            if previous is not None:
+                offset_ns = max(offset_ns, previous + self.interval_ns)
+            self.offsets_ns.append(offset_ns)
+            previous = offset_ns
+
+    @classmethod
+    def from_offsets_ns(cls, offsets_ns, tolerance_ns=SCHEDULE_LAG_TOLERANCE_NS):
+        """Schedule with exactly these intended start times in nanoseconds
+
+        Used to hand a share of an existing schedule to a worker process
+        without a round trip through float seconds, which can be off by 1 ns.
+        """
+        schedule = cls((), tolerance_ns=tolerance_ns)
+        schedule.offsets_ns = list(offsets_ns)
+        return schedule
+
+    def offset(self, index):
+        return self.offsets_ns[index]
+
+
+class LatencyRecorder:
+    """Per-worker latency, queue delay and service time histograms"""
+
+    def __init__(self, keys=(), window=None, profile=False):
+        self.latency = PerThreadHistograms()
+        self.queue_delay = PerThreadHistograms()
+        self.service_time = PerThreadHistograms()
+        # Optional latency breakdown, e.g. per endpoint; keys are fixed up
+        # front so workers never have to create entries
+        self.latency_by_key = {key: PerThreadHistograms() for key in keys}
+        # Optional SlidingWindowHistogram feeding a live progress line
+        self.window = window
+        # Optional split of the service time into time blocked in socket
+        # calls and time in client code (see client_profiler.py)
+        self.socket_wait = PerThreadHistograms() if profile else None
+        self.client_time = PerThreadHistograms() if profile else None
+
+    def record(self, intended_ns, start_ns, end_ns, key=None, warmup=False, wait_ns=None):
+        """Record one request given its intended start, actual start and end
+        
+        Warmup requests only feed the live window, not the run's histograms.
+        wait_ns is the part of the service time spent blocked on the socket.
+        """
+        if self.window is not None:
+            self.window.record(end_ns - intended_ns)
+        if warmup:
+            return
+        self.latency.get().record(end_ns - intended_ns)
+        self.queue_delay.get().record(start_ns - intended_ns)
+        self.service_time.get().record(end_ns - start_ns)
+        if key is not None:
+            self.latency_by_key[key].get().record(end_ns - intended_ns)
+        if wait_ns is not None and self.socket_wait is not None:
+            self.socket_wait.get().record(wait_ns)
+            self.client_time.get().record(max(end_ns - start_ns - wait_ns, 0))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Result Sink - FOR EDUCATIONAL PURPOSES ONLY
+
+Streams one compact JSON record per request to a JSONL file (one JSON object
+per line, the same layout as the repository's requests.jsonl).
+
+Worker threads only put a tuple on a queue; a background writer thread turns
+the tuples into JSON and writes them through a large file buffer. Keeping the
+serialisation and the file I/O off the measuring threads means the recording
+does not show up in the latencies it records, and memory stays flat however
+long the run is.
+
+Record fields (times in nanoseconds relative to the start of the run):
+
+- intended_ns: when the request was scheduled to start
+- start_ns:    when a worker actually started it
+- latency_ns:  response complete minus intended start
+- status:      HTTP status code, or null if the request failed
+- bytes:       response body size
+- error:       exception class name, or null
+- endpoint:    workload endpoint name (only present in scenario runs)
+- socket_wait_ns: time blocked in socket calls (only present with --profile)
+- warmup:      true for requests sent during --warmup (absent otherwise);
+               load_report.py leaves them out like the live summary does
+"""
+
+import json
+import os
+import queue
+import shutil
+import threading
+
+WRITE_BUFFER_SIZE = 1 << 16
+
+_STOP = object()
+
+
+class _AppendFile:
+    """Queue item: copy the records of another results file"""
+
+    def __init__(self, path, remove):
+        self.path = path
+        self.remove = remove
+
+
+class ResultSink:
+    """Buffered background writer of per-request JSONL records"""
+
+    def __init__(self, path, origin_ns=0):
+        self.path = path
+        self.origin_ns = origin_ns
+        self.records_written = 0
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, "w", buffering=WRITE_BUFFER_SIZE)
+        self._thread = threading.Thread(target=self._write_loop, name="result-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, intended_ns, start_ns, end_ns, status, size, error=None, endpoint=None, wait_ns=None,
+              warmup=False):
+        """Queue one request record (cheap; called from the measuring threads)"""
+        self._queue.put((intended_ns, start_ns, end_ns, status, size, error, endpoint, wait_ns, warmup))
+
+    def _write_loop(self):
+        dumps = json.dumps
+        write = self._file.write
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if type(item) is _AppendFile:
+                self._copy_records(item.path)
+                if item.remove:
+                    os.remove(item.path)
+                continue
+            intended_ns, start_ns, end_ns, status, size, error, endpoint, wait_ns, warmup = item
+            origin_ns = self.origin_ns
+            record = {
+                "intended_ns": intended_ns - origin_ns,
+                "start_ns": start_ns - origin_ns,
+                "latency_ns": end_ns - intended_ns,
+                "status": status,
+                "bytes": size,
+                "error": error,
+            }
+            if endpoint is not None:
+                record["endpoint"] = endpoint
+            if wait_ns is not None:
+                record["socket_wait_ns"] = wait_ns
+            if warmup:
+                record["warmup"] = True
+            write(dumps(record, separators=(",", ":")))
+            write("\n")
+            self.records_written += 1
+
+    def append_file(self, path, remove=False):
+        """Queue the records of another results file, e.g. one written by a worker process"""
+        self._queue.put(_AppendFile(path, remove))
+
+    def _copy_records(self, path):
+        with open(path) as f:
+            shutil.copyfileobj(f, self._file)
+            f.seek(0)
+            self.records_written += sum(1 for _ in f)
+
+    def close(self):
+        """Flush all queued records and close the file"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
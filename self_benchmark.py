@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Self-Benchmark Suite - FOR EDUCATIONAL PURPOSES ONLY
+
+Measures the overhead and accuracy of the load testing tools themselves by
+running them against the bundled local target server with known, injected
+latencies. Nothing leaves the machine.
+
+For every injected latency and case a fresh server is started in a separate
+process, so its CPU use and GIL do not distort the client's numbers. The
+cases are:
+
+- load tester, threads and asyncio engines, with reused and new connections,
+  over HTTP and over HTTPS (the server's self-signed certificate is trusted)
+- the phase-timed HTTP probe used by network_protocol_simulator.py --phases
+
+For each case the report shows:
+
+- service p50/p99: what the tool measured
+- error p50: measured p50 minus the injected latency (measurement accuracy)
+- overhead p50: measured p50 minus the server's own handler time p50, i.e.
+  client, kernel and loopback cost
+- CPU/request: client CPU time per request
+
+Results can be saved with --json-out and checked against a saved baseline
+with --baseline, so engine changes can be tested for regressions offline.
+
+Usage:
+    python self_benchmark.py --latencies 0,5,20 --json-out baseline.json
+    python self_benchmark.py --baseline baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+import controlled_load_tester
+from http_probe import timed_http_request
+from latency_histogram import LatencyHistogram
+from local_target_server import LocalTargetServer, TargetServerConfig
+
+# (engine, connection mode, TLS)
+LOAD_TEST_CASES = [
+    ("threads", "reuse", False),
+    ("threads", "new", False),
+    ("asyncio", "reuse", False),
+    ("asyncio", "new", False),
+    ("threads", "reuse", True),
+    ("threads", "new", True),
+    ("asyncio", "reuse", True),
+    ("asyncio", "new", True),
+]
+
+# A case regresses when its overhead or CPU grows by more than the relative
+# tolerance AND by more than this absolute slack (loopback noise)
+REGRESSION_SLACK_MS = 0.2
+
+
+def serve_in_child(config, conn, tls=False):
+    """Child process: run a server until told to stop, then report handler p50"""
+    server = LocalTargetServer(config, tls=tls)
+    server.start()
+    conn.send((server.port, server.certfile))
+    conn.recv()
+    conn.send(server.handler_times.percentile(50))
+    server.stop()
+
+
+def run_load_test_case(url, engine, connection, args, verify=True):
+    result = controlled_load_tester.run_load_test(
+        url, args.requests, args.threads, args.delay, timeout=5.0,
+        engine=engine, connection=connection, verbose=False, verify=verify,
+    )
+    service = result.recorder.service_time.merged()
+    errors = result.stats.error_count
+    return service, result.cpu_time / result.stats.total_requests, errors
+
+
+def run_probe_case(port, args):
+    histogram = LatencyHistogram()
+    errors = 0
+    cpu_start = time.process_time()
+    for _ in range(args.requests):
+        try:
+            result = timed_http_request("127.0.0.1", port, "/", timeout=5)
+            histogram.record(result.timings.total)
+        except OSError:
+            errors += 1
+    return histogram, (time.process_time() - cpu_start) / args.requests, errors
+
+
+def run_suite(args):
+    results = []
+    for latency_ms in args.latencies:
+        config = TargetServerConfig(latency_ms=latency_ms, size=args.size)
+        cases = [(f"{engine}/{connection}{'/https' if tls else ''}", engine, connection, tls)
+                 for engine, connection, tls in LOAD_TEST_CASES]
+        cases.append(("probe/new", None, None, False))
+        for name, engine, connection, tls in cases:
+            # A fresh server per case keeps the handler histogram per case
+            conn, child_conn = multiprocessing.Pipe()
+            child = multiprocessing.Process(target=serve_in_child, args=(config, child_conn, tls), daemon=True)
+            child.start()
+            try:
+                port, certfile = conn.recv()
+                if engine is None:
+                    service, cpu_per_request, errors = run_probe_case(port, args)
+                else:
+                    url = f"{'https' if tls else 'http'}://127.0.0.1:{port}/"
+                    service, cpu_per_request, errors = run_load_test_case(url, engine, connection, args,
+                                                                          certfile or True)
+                conn.send("stop")
+                handler_p50 = conn.recv()
+            finally:
+                child.join(timeout=5)
+                if child.is_alive():
+                    child.terminate()
+            p50 = service.percentile(50) / 1e6
+            results.append({
+                "case": name,
+                "latency_ms": latency_ms,
+                "p50_ms": p50,
+                "p99_ms": service.percentile(99) / 1e6,
+                "error_p50_ms": p50 - latency_ms,
+                "overhead_p50_ms": p50 - handler_p50 / 1e6,
+                "cpu_per_request_ms": cpu_per_request * 1000,
+                "errors": errors,
+            })
+            print_row(results[-1])
+    return results
+
+
+def print_header():
+    print(f"{'CASE':<20} {'INJECTED':>9} {'P50 MS':>9} {'P99 MS':>9} {'ERR P50':>9} {'OVERHEAD':>9} {'CPU/REQ':>9} {'ERRORS':>7}")
+
+
+def print_row(row):
+    print(f"{row['case']:<20} {row['latency_ms']:>9g} {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} "
+          f"{row['error_p50_ms']:>+9.3f} {row['overhead_p50_ms']:>9.3f} {row['cpu_per_request_ms']:>9.3f} {row['errors']:>7}")
+
+
+def find_regressions(results, baseline, tolerance):
+    """Return a description of every case that got slower than the baseline"""
+    previous = {(row["case"], row["latency_ms"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        before = previous.get((row["case"], row["latency_ms"]))
+        if before is None:
+            continue
+        for metric in ("overhead_p50_ms", "cpu_per_request_ms"):
+            old, new = before[metric], row[metric]
+            if new > old * (1 + tolerance) and new - old > REGRESSION_SLACK_MS:
+                regressions.append(f"{row['case']} @ {row['latency_ms']:g} ms: {metric} {old:.3f} -> {new:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the load testing tools' own overhead against a local server")
+    parser.add_argument("--latencies", default="0,5,20",
+                        help="Comma-separated injected latencies in ms (default: 0,5,20)")
+    parser.add_argument("--requests", type=int, default=30, help="Requests per case (default: 30)")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrency per case (default: 4)")
+    parser.add_argument("--delay", type=float, default=controlled_load_tester.MIN_DELAY,
+                        help=f"Request interval in seconds (default: {controlled_load_tester.MIN_DELAY})")
+    parser.add_argument("--size", type=int, default=1024, help="Response body size in bytes (default: 1024)")
+    parser.add_argument("--json-out", help="Save the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved earlier with --json-out")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed relative growth of overhead and CPU per request (default: 0.5)")
+
+    args = parser.parse_args()
+    args.latencies = [float(value) for value in args.latencies.split(",") if value.strip()]
+
+    print(f"Self-benchmark: {args.requests} requests per case, concurrency {args.threads}, interval {args.delay} s\n")
+    print_header()
+    results = run_suite(args)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.json_out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nBenchmark interrupted by user.")
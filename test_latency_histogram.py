@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for latency_histogram.py - FOR EDUCATIONAL PURPOSES ONLY
+
+Run with: python -m unittest test_latency_histogram
+"""
+
+import random
+import unittest
+
+from latency_histogram import LatencyHistogram
+
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.histogram = LatencyHistogram(max_value=10_000_000_000)
+        self.max_error = 2 ** (1 - self.histogram.sub_bucket_bits)
+
+    def test_small_values_are_exact(self):
+        for value in range(self.histogram._sub_count):
+            index = self.histogram._index_for(value)
+            self.assertEqual(index, value)
+            self.assertEqual(self.histogram._value_for(index), value)
+
+    def test_upper_bound_round_trip(self):
+        for index in range(self.histogram._max_index + 1):
+            upper = self.histogram._value_for(index)
+            self.assertEqual(self.histogram._index_for(upper), index)
+            self.assertEqual(self.histogram._index_for(upper + 1), min(index + 1, self.histogram._max_index))
+
+    def test_bucket_error_is_bounded(self):
+        rng = random.Random(1)
+        values = [rng.randrange(1, self.histogram.max_value) for _ in range(5000)]
+        values += [2 ** k for k in range(1, 33)] + [2 ** k - 1 for k in range(1, 33)]
+        for value in values:
+            upper = self.histogram._value_for(self.histogram._index_for(value))
+            self.assertGreaterEqual(upper, value)
+            self.assertLess((upper - value) / value, self.max_error)
+
+    def test_bucket_upper_bounds_increase(self):
+        bounds = self.histogram.bucket_upper_bounds()
+        self.assertEqual(len(bounds), self.histogram._max_index + 1)
+        self.assertTrue(all(a < b for a, b in zip(bounds, bounds[1:])))
+
+
+class MergeTest(unittest.TestCase):
+    def test_merge_equals_recording_everything(self):
+        rng = random.Random(2)
+        first, second, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for histogram in (first, second):
+            for _ in range(1000):
+                value = int(rng.lognormvariate(15, 1.5))
+                histogram.record(value)
+                combined.record(value)
+        merged = LatencyHistogram().merge(first).merge(second)
+        self.assertEqual(list(merged.counts), list(combined.counts))
+        self.assertEqual(merged.total_count, combined.total_count)
+        self.assertEqual(merged.total_value, combined.total_value)
+        self.assertEqual(merged.min_value, combined.min_value)
+        self.assertEqual(merged.max_recorded, combined.max_recorded)
+
+    def test_merge_empty(self):
+        histogram = LatencyHistogram()
+        histogram.record(42)
+        histogram.merge(LatencyHistogram())
+        self.assertEqual(histogram.total_count, 1)
+        self.assertEqual(histogram.min_value, 42)
+
+    def test_merge_different_layouts_fails(self):
+        with self.assertRaises(ValueError):
+            LatencyHistogram().merge(LatencyHistogram(sub_bucket_bits=10))
+
+
+class PercentileTest(unittest.TestCase):
+    def check_against_reference(self, values, sub_bucket_bits):
+        histogram = LatencyHistogram(sub_bucket_bits=sub_bucket_bits)
+        for value in values:
+            histogram.record(value)
+        reference = sorted(values)
+        max_error = 2 ** (1 - sub_bucket_bits)
+        for percent in (0.1, 1, 10, 25, 50, 75, 90, 99, 99.9):
+            rank = max(1, int(len(reference) * percent / 100.0 + 0.5))
+            expected = reference[rank - 1]
+            actual = histogram.percentile(percent)
+            self.assertGreaterEqual(actual, expected, f"p{percent}")
+            self.assertLessEqual(actual - expected, expected * max_error, f"p{percent}")
+        self.assertEqual(histogram.percentile(100), reference[-1])
+
+    def test_uniform(self):
+        rng = random.Random(3)
+        self.check_against_reference([rng.randrange(1_000_000, 50_000_000) for _ in range(10_000)], 7)
+
+    def test_lognormal_fine_layout(self):
+        rng = random.Random(4)
+        self.check_against_reference([int(rng.lognormvariate(14, 2)) for _ in range(10_000)], 10)
+
+    def test_never_above_max_recorded(self):
+        histogram = LatencyHistogram()
+        histogram.record(1_000_001)
+        self.assertEqual(histogram.percentile(50), 1_000_001)
+
+    def test_empty(self):
+        self.assertEqual(LatencyHistogram().percentile(99), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
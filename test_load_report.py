@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for load_report.py - FOR EDUCATIONAL PURPOSES ONLY
+
+Run with: python -m unittest test_load_report
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import load_report
+
+
+def make_records(extra_keys):
+    """ResultSink-style records: successes, HTTP errors and failed requests"""
+    records = []
+    for i in range(30):
+        failed = i % 7 == 3
+        record = {
+            "intended_ns": i * 100_000_000,
+            "start_ns": i * 100_000_000 + 1234,
+            "latency_ns": 2_000_000 + i * 5001,
+            "status": None if failed else (500 if i % 5 == 0 else 200),
+            "bytes": 0 if failed else 1024 + i,
+            "error": "ConnectionError" if failed else None,
+        }
+        if "endpoint" in extra_keys:
+            record["endpoint"] = ["GET /a", 'POST /b "quoted"', "GET /c,1:2"][i % 3]
+        if "socket_wait_ns" in extra_keys:
+            record["socket_wait_ns"] = 900_000 + i
+        if i < 4:
+            record["warmup"] = True
+        records.append(record)
+    return records
+
+
+class LoadColumnsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, records):
+        path = os.path.join(self.directory.name, "run.jsonl")
+        with open(path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        return path
+
+    def test_fast_path_matches_slow_path_for_every_layout(self):
+        for extra_keys in load_report._EXTRA_KEY_LAYOUTS:
+            with self.subTest(extra_keys=extra_keys):
+                path = self.write(make_records(extra_keys))
+                with open(path, "rb") as f:
+                    expected_columns, expected_errors, expected_endpoints, expected_warmup = \
+                        load_report._load_rows(f.read())
+
+                slow_path_calls = []
+                load_rows = load_report._load_rows
+
+                def counting_load_rows(data):
+                    slow_path_calls.append(len(data))
+                    return load_rows(data)
+
+                load_report._load_rows = counting_load_rows
+                try:
+                    columns, errors, endpoints, warmup = load_report.load_columns(path)
+                finally:
+                    load_report._load_rows = load_rows
+
+                self.assertEqual(slow_path_calls, [], "fell back to the slow path")
+                for field in load_report.FIELDS:
+                    self.assertEqual(columns[field].tolist(), expected_columns[field].tolist(), field)
+                self.assertEqual(errors.tolist(), expected_errors.tolist())
+                self.assertEqual(endpoints.tolist(), expected_endpoints.tolist())
+                self.assertEqual(warmup.tolist(), expected_warmup.tolist())
+                self.assertEqual(int(warmup.sum()), 4)
+
+    def test_unknown_layout_uses_slow_path(self):
+        records = make_records(())
+        for record in records:
+            record["retries"] = 1
+        columns, errors, _, _ = load_report.load_columns(self.write(records))
+        self.assertEqual(columns["latency_ns"].tolist(), [record["latency_ns"] for record in records])
+        self.assertEqual(errors.tolist(), [record["error"] or "" for record in records])
+
+    def test_load_runs_excludes_warmup_by_default(self):
+        path = self.write(make_records(("endpoint",)))
+        run = load_report.load_runs([path])
+        self.assertEqual(len(run), 26)
+        self.assertEqual(run.warmup_excluded, 4)
+        self.assertEqual(run.intended_ns.min(), 4 * 100_000_000)
+        self.assertEqual(len(load_report.load_runs([path], include_warmup=True)), 30)
+
+
+class TailSamplesTest(unittest.TestCase):
+    def test_verdict_needs_samples_above_the_percentile(self):
+        self.assertTrue(load_report.has_tail_samples(20, 50))
+        self.assertFalse(load_report.has_tail_samples(30, 99))
+        self.assertTrue(load_report.has_tail_samples(1000, 99))
+        self.assertFalse(load_report.has_tail_samples(1000, 99.9))
+
+
+if __name__ == "__main__":
+    unittest.main()
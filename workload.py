@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Workload Scenarios - FOR EDUCATIONAL PURPOSES ONLY
+
+Loads a multi-endpoint workload from a JSONL file (one JSON object per line,
+like the repository's requests.jsonl). Two kinds of file are supported.
+
+Weighted mix, each line one endpoint:
+
+    {"name": "home", "method": "GET", "path": "/", "weight": 8}
+    {"name": "search", "method": "GET", "path": "/search?q=load", "weight": 3}
+    {"name": "signup", "method": "POST", "path": "/signup", "json": {"user": "demo"}, "weight": 1}
+
+Trace replay, each line one recorded request with its arrival time in seconds
+since the start of the trace ("at") or since the previous request ("delay"):
+
+    {"at": 0.00, "method": "GET", "path": "/"}
+    {"at": 0.35, "method": "GET", "path": "/style.css"}
+
+Optional fields: "url" (absolute, instead of "path"), "headers", "body"
+(string) or "json" (object). Every request is built once when the file is
+loaded, so the hot loop only has to pick an endpoint and send it. Every URL is
+checked against the caller's whitelist before anything is sent.
+"""
+
+import bisect
+import json
+import random
+from urllib.parse import urljoin
+
+import requests
+
+_PREPARER = requests.Session()
+
+
+class Endpoint:
+    """One request of the workload, prepared once at load time"""
+
+    def __init__(self, name, method, url, headers=None, body=None):
+        self.name = name
+        self.method = method.upper()
+        self.url = url
+        self.headers = dict(headers or {})
+        self.body = body or b""
+        # Prepared through a session so the usual default headers are merged in
+        self.prepared = _PREPARER.prepare_request(
+            requests.Request(self.method, url, headers=self.headers, data=self.body or None)
+        )
+
+
+class Workload:
+    """Weighted endpoint mix, or a recorded trace to replay"""
+
+    def __init__(self, endpoints, weights=None, trace=None):
+        self.endpoints = endpoints
+        self.trace = trace
+        weights = weights or [1] * len(endpoints)
+        self._cum_weights = []
+        total = 0
+        for weight in weights:
+            total += weight
+            self._cum_weights.append(total)
+        self._total_weight = total
+
+    @property
+    def is_replay(self):
+        return self.trace is not None
+
+    @property
+    def names(self):
+        return [endpoint.name for endpoint in self.endpoints]
+
+    def pick(self, index, rng=random):
+        """Return the endpoint for request number index"""
+        if self.trace is not None:
+            return self.endpoints[self.trace[index][1]]
+        position = bisect.bisect_right(self._cum_weights, rng.random() * self._total_weight)
+        return self.endpoints[min(position, len(self.endpoints) - 1)]
+
+    def replay_offsets(self):
+        """Arrival offsets of the trace in seconds"""
+        return [offset for offset, _ in self.trace]
+
+
+def _entry_body(entry, headers):
+    if "json" in entry:
+        headers.setdefault("Content-Type", "application/json")
+        return json.dumps(entry["json"]).encode()
+    body = entry.get("body")
+    if body is None:
+        return b""
+    return body.encode() if isinstance(body, str) else json.dumps(body).encode()
+
+
+def load_workload(path, base_url, is_allowed, default_headers=None):
+    """Load a workload file; is_allowed(url) must accept every URL in it"""
+    entries = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})")
+    if not entries:
+        raise ValueError(f"{path} contains no requests")
+
+    replay = any("at" in entry or "delay" in entry for entry in entries)
+    endpoints = []
+    by_key = {}
+    weights = []
+    trace = [] if replay else None
+    offset = 0.0
+    blocked = []
+
+    for line_number, entry in enumerate(entries, 1):
+        if "url" not in entry and "path" not in entry:
+            raise ValueError(f"{path}: request {line_number} has neither 'path' nor 'url'")
+        url = entry.get("url") or urljoin(base_url, entry["path"])
+        if not is_allowed(url):
+            blocked.append(url)
+            continue
+        method = entry.get("method", "GET")
+        headers = dict(default_headers or {})
+        headers.update(entry.get("headers") or {})
+        body = _entry_body(entry, headers)
+        name = entry.get("name") or f"{method.upper()} {entry.get('path') or url}"
+
+        if replay:
+            offset = float(entry["at"]) if "at" in entry else offset + float(entry.get("delay", 0.0))
+            # Identical requests in a trace share one prepared endpoint
+            key = (name, method.upper(), url, json.dumps(headers, sort_keys=True), body)
+            if key not in by_key:
+                by_key[key] = len(endpoints)
+                endpoints.append(Endpoint(name, method, url, headers, body))
+            trace.append((offset, by_key[key]))
+        else:
+            weight = float(entry.get("weight", 1))
+            if weight <= 0:
+                raise ValueError(f"{path}: request {line_number} needs a positive weight")
+            endpoints.append(Endpoint(name, method, url, headers, body))
+            weights.append(weight)
+
+    if blocked:
+        raise ValueError(f"Workload targets are not in the whitelist: {', '.join(sorted(set(blocked)))}")
+
+    if replay:
+        trace.sort(key=lambda item: item[0])
+        start = trace[0][0]
+        trace = [(offset - start, index) for offset, index in trace]
+        return Workload(endpoints, trace=trace)
+    return Workload(endpoints, weights=weights)